@@ -6,7 +6,7 @@ import logging
 
 from mcp.server.stdio import stdio_server
 
-from .server import create_server
+from .server import create_server, shutdown_workers
 
 logger = logging.getLogger(__name__)
 
@@ -48,7 +48,10 @@ async def _run():
     resolved = os.path.abspath(args.setools_dir) if args.setools_dir else "(not set)"
     async with stdio_server() as (read_stream, write_stream):
         logger.info("Alif Ensemble Flash MCP server starting — setools_dir: %s", resolved)
-        await server.run(read_stream, write_stream, init_options)
+        try:
+            await server.run(read_stream, write_stream, init_options)
+        finally:
+            shutdown_workers()
 
 
 def main():
@@ -2,11 +2,33 @@
 
 Maps board names to hardware-specific configuration: J-Link device names,
 MRAM layouts, baud rates, and tool paths.
+
+The registry is frozen at import: every mapping is a read-only
+MappingProxyType, so get_config() can hand out shared references without
+callers being able to corrupt another caller's view. Use as_dict() when a
+plain, mutable copy is needed (e.g. for JSON serialisation).
 """
 
+from types import MappingProxyType
+
 DEFAULT_DEVICE = "alif-e7"
 
-DEVICES = {
+
+def _freeze(value):
+    """Recursively wrap dicts in read-only mapping proxies."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    return value
+
+
+def as_dict(value):
+    """Recursively copy a frozen mapping back into plain dicts."""
+    if isinstance(value, MappingProxyType):
+        return {k: as_dict(v) for k, v in value.items()}
+    return value
+
+
+DEVICES = _freeze({
     "alif-e7": {
         "jlink_device": "AE722F80F55D5_HP",
         "jlink_device_reset": "AE722F80F55D5_A32_0",
@@ -59,17 +81,21 @@ DEVICES = {
             },
         },
     },
-}
+})
+
+_DEVICE_NAMES = tuple(sorted(DEVICES))
+_AVAILABLE = ", ".join(_DEVICE_NAMES)
 
 
-def get_config(device: str | None = None) -> dict:
-    """Get device configuration by name. Defaults to alif-e7."""
+def get_config(device: str | None = None) -> MappingProxyType:
+    """Get (read-only) device configuration by name. Defaults to alif-e7."""
     name = device or DEFAULT_DEVICE
-    if name not in DEVICES:
-        raise ValueError(f"Unknown device '{name}'. Available: {', '.join(sorted(DEVICES))}")
-    return DEVICES[name]
+    try:
+        return DEVICES[name]
+    except KeyError:
+        raise ValueError(f"Unknown device '{name}'. Available: {_AVAILABLE}") from None
 
 
 def list_devices() -> list[str]:
     """List available device names."""
-    return sorted(DEVICES.keys())
+    return list(_DEVICE_NAMES)
@@ -6,22 +6,37 @@ Data transfers use 240-byte chunks with 2-byte LE sequence numbers.
 """
 
 import asyncio
-import glob
+import collections
+import concurrent.futures
+import ctypes
 import logging
 import os
+import select
 import struct
 import subprocess
+import sys
 import tempfile
+import threading
 import time
 
 import serial
 
+from . import jsonio
+
 logger = logging.getLogger(__name__)
 
 # Protocol constants
 BAUD_RATE = 57600
 DATA_PER_CHUNK = 240
 
+# DOWNLOAD_DATA frames sent ahead of the oldest unacknowledged one.
+# 1 = stop-and-wait (validated). Raise only once the SE is confirmed to
+# queue back-to-back frames without dropping ACKs.
+DOWNLOAD_WINDOW = 1
+
+# Minimum seconds between per-segment progress lines.
+PROGRESS_INTERVAL = 1.0
+
 # Commands
 CMD_START_ISP = 0x00
 CMD_STOP_ISP = 0x01
@@ -34,19 +49,62 @@ CMD_SET_MAINTENANCE = 0x16
 CMD_ACK = 0xFE
 CMD_DATA_RESP = 0xFD
 
+# Precompiled payload formats
+_SEQ_STRUCT = struct.Struct('<H')     # DOWNLOAD_DATA sequence number
+_BURN_STRUCT = struct.Struct('<II')   # BURN_MRAM address + size
 
-def calc_checksum(data: bytes) -> int:
-    """All bytes including checksum must sum to 0 mod 256."""
-    return (0 - sum(data)) & 0xFF
+
+def calc_checksum(data: bytes | bytearray | memoryview, partial: int = 0) -> int:
+    """All bytes including checksum must sum to 0 mod 256.
+
+    sum() over a bytes-like object iterates in C, which beats any
+    Python-level word folding for packet-sized buffers. Accepts memoryview
+    slices so callers can checksum without copying. ``partial`` is a
+    running sum of bytes already emitted (e.g. length + cmd) so the header
+    doesn't need to be re-summed with the payload.
+    """
+    return -(partial + sum(data)) & 0xFF
 
 
 def make_packet(cmd: int, data: bytes = b'') -> bytes:
     """Build ISP packet: [length, cmd, data..., checksum]."""
-    payload = bytes([cmd]) + data
-    length = len(payload) + 2  # +1 for length byte, +1 for checksum
-    pkt = bytes([length]) + payload
-    pkt += bytes([calc_checksum(pkt)])
-    return pkt
+    length = len(data) + 3  # length byte + cmd + data + checksum
+    return bytes([length, cmd]) + data + bytes([calc_checksum(data, length + cmd)])
+
+
+# DOWNLOAD_DATA frame: [length, cmd, seq_lo, seq_hi, data..., checksum].
+# Full chunks dominate, so their length byte and header sum are constants.
+_DL_FRAME_SIZE = DATA_PER_CHUNK + 5
+_DL_FULL_HEADER_SUM = _DL_FRAME_SIZE + CMD_DOWNLOAD_DATA
+
+
+def _new_download_frame() -> bytearray:
+    """Allocate a reusable DOWNLOAD_DATA frame buffer."""
+    buf = bytearray(_DL_FRAME_SIZE)
+    buf[1] = CMD_DOWNLOAD_DATA
+    return buf
+
+
+def _fill_download_frame(buf: bytearray, seq: int, chunk) -> int:
+    """Frame ``chunk`` as DOWNLOAD_DATA ``seq`` in place. Returns the frame length.
+
+    Equivalent to make_packet(CMD_DOWNLOAD_DATA, seq_le16 + chunk) without
+    allocating; ``buf`` comes from _new_download_frame().
+    """
+    seq_sum = (seq & 0xFF) + ((seq >> 8) & 0xFF)
+    if len(chunk) == DATA_PER_CHUNK:
+        buf[0] = _DL_FRAME_SIZE
+        _SEQ_STRUCT.pack_into(buf, 2, seq)
+        buf[4:_DL_FRAME_SIZE - 1] = chunk
+        buf[_DL_FRAME_SIZE - 1] = calc_checksum(chunk, _DL_FULL_HEADER_SUM + seq_sum)
+        return _DL_FRAME_SIZE
+    # Short final chunk
+    pkt_len = len(chunk) + 5
+    buf[0] = pkt_len
+    _SEQ_STRUCT.pack_into(buf, 2, seq)
+    buf[4:pkt_len - 1] = chunk
+    buf[pkt_len - 1] = calc_checksum(chunk, pkt_len + CMD_DOWNLOAD_DATA + seq_sum)
+    return pkt_len
 
 
 def read_response(ser: serial.Serial, timeout: float = 2) -> tuple[int | None, bytes]:
@@ -57,17 +115,22 @@ def read_response(ser: serial.Serial, timeout: float = 2) -> tuple[int | None, b
     except serial.SerialException:
         return None, b''
     try:
-        first = ser.read(1)
-        if not first:
+        # The smallest well-formed packet (ACK) is 3 bytes, so one read
+        # covers the common case; only longer responses need a second read.
+        head = ser.read(3)
+        if not head:
             return None, b''
-        length = first[0]
-        if length < 2:
+        length = head[0]
+        if length < 3:
             return None, b''
-        rest = ser.read(length - 1)
-        if len(rest) < 1:
+        pkt = head
+        if length > 3 and len(head) == 3:
+            pkt = bytearray(head)
+            pkt.extend(ser.read(length - 3))
+        if len(pkt) < 2:
             return None, b''
-        cmd = rest[0]
-        data = rest[1:-1] if len(rest) > 2 else b''
+        cmd = pkt[1]
+        data = bytes(pkt[2:-1]) if len(pkt) > 3 else b''
         return cmd, data
     except (serial.SerialException, OSError):
         return None, b''
@@ -78,17 +141,34 @@ def read_response(ser: serial.Serial, timeout: float = 2) -> tuple[int | None, b
             pass
 
 
+def _drain(ser: serial.Serial) -> None:
+    """Discard whatever input is pending.
+
+    in_waiting is a FIONREAD ioctl that is usually 0, cheaper than the
+    tcflush behind reset_input_buffer(). Only needed after a reply that
+    didn't parse — a good reply leaves the input buffer empty.
+    """
+    try:
+        pending = ser.in_waiting
+        if pending:
+            ser.read(pending)
+    except (serial.SerialException, OSError):
+        pass
+
+
 def send_cmd(ser: serial.Serial, cmd: int, data: bytes = b'',
              label: str = "", quiet: bool = False) -> tuple[bool, bytes]:
     """Send ISP command, read response. Returns (ok, resp_data)."""
     pkt = make_packet(cmd, data)
-    ser.reset_input_buffer()
     ser.write(pkt)
     ser.flush()
-    time.sleep(0.05)
 
+    # read_response blocks until the reply arrives — no settle delay needed.
+    # START_ISP handshakes keep their own pre-send delay in start_isp().
     resp_cmd, resp_data = read_response(ser)
     ok = resp_cmd in (CMD_ACK, CMD_DATA_RESP)
+    if not ok:
+        _drain(ser)
 
     if not quiet:
         if resp_cmd == CMD_ACK:
@@ -104,12 +184,89 @@ def send_cmd(ser: serial.Serial, cmd: int, data: bytes = b'',
     return ok, resp_data
 
 
+_DEV_DIR = "/dev"
+_SE_UART_PREFIXES = ("cu.usbmodem", "cu.usbserial")
+
+
 def find_se_uart() -> list[str]:
-    """Find available USB serial ports (JLink VCOM and FTDI)."""
-    ports = glob.glob("/dev/cu.usbmodem*") + glob.glob("/dev/cu.usbserial*")
+    """Find available USB serial ports (JLink VCOM and FTDI).
+
+    Lists /dev once and filters by prefix, rather than one glob (and one
+    directory scan) per pattern.
+    """
+    try:
+        with os.scandir(_DEV_DIR) as it:
+            ports = [e.path for e in it if e.name.startswith(_SE_UART_PREFIXES)]
+    except OSError:
+        return []
     return sorted(ports)
 
 
+class _DevWatch:
+    """Block until an entry is added to or removed from /dev.
+
+    Uses kqueue (macOS/BSD) or inotify (Linux, via libc) so replug
+    detection wakes on the event instead of rescanning /dev on a timer.
+    Falls back to plain polling when neither is available. Waits are
+    capped so a missed event only costs one extra rescan.
+    """
+
+    POLL_INTERVAL = 0.3
+    MAX_EVENT_WAIT = 1.0
+
+    def __init__(self):
+        self._kq = None
+        self._fd = None
+        try:
+            if hasattr(select, "kqueue"):
+                self._fd = os.open("/dev", os.O_RDONLY)
+                self._kq = select.kqueue()
+                self._kq.control([select.kevent(
+                    self._fd, filter=select.KQ_FILTER_VNODE,
+                    flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+                    fflags=select.KQ_NOTE_WRITE)], 0, 0)
+            elif sys.platform.startswith("linux"):
+                libc = ctypes.CDLL(None, use_errno=True)
+                fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+                if fd < 0:
+                    raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+                self._fd = fd
+                if libc.inotify_add_watch(fd, b"/dev", 0x100 | 0x200) < 0:  # IN_CREATE | IN_DELETE
+                    raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+        except (OSError, AttributeError):
+            self.close()
+
+    def wait(self, timeout: float) -> None:
+        if timeout <= 0:
+            return
+        if self._kq is not None:
+            self._kq.control(None, 1, min(timeout, self.MAX_EVENT_WAIT))
+        elif self._fd is not None:
+            ready, _, _ = select.select([self._fd], [], [], min(timeout, self.MAX_EVENT_WAIT))
+            if ready:
+                try:
+                    while os.read(self._fd, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+        else:
+            time.sleep(min(timeout, self.POLL_INTERVAL))
+
+    def close(self) -> None:
+        if self._kq is not None:
+            self._kq.close()
+            self._kq = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 def wait_for_replug(timeout_disappear: float = 30, timeout_total: float = 60) -> str | None:
     """Wait for USB serial port to disappear then reappear.
 
@@ -117,26 +274,30 @@ def wait_for_replug(timeout_disappear: float = 30, timeout_total: float = 60) ->
     """
     start = time.time()
 
-    # Wait for port to disappear
-    while time.time() - start < timeout_disappear:
-        ports = find_se_uart()
-        if not ports:
-            logger.info("Port disappeared — board unplugged")
-            break
-        time.sleep(0.3)
-    else:
-        logger.warning("Timed out waiting for port to disappear (%ds)", timeout_disappear)
-        return None
-
-    # Wait for port to reappear
-    while time.time() - start < timeout_total:
-        ports = find_se_uart()
-        if ports:
-            port = ports[0]
-            logger.info("Port reappeared: %s", port)
-            time.sleep(0.5)  # Let USB settle
-            return port
-        time.sleep(0.3)
+    with _DevWatch() as watch:
+        # Wait for port to disappear
+        while True:
+            if not find_se_uart():
+                logger.info("Port disappeared — board unplugged")
+                break
+            remaining = timeout_disappear - (time.time() - start)
+            if remaining <= 0:
+                logger.warning("Timed out waiting for port to disappear (%ds)", timeout_disappear)
+                return None
+            watch.wait(remaining)
+
+        # Wait for port to reappear
+        while True:
+            ports = find_se_uart()
+            if ports:
+                port = ports[0]
+                logger.info("Port reappeared: %s", port)
+                time.sleep(0.5)  # Let USB settle
+                return port
+            remaining = timeout_total - (time.time() - start)
+            if remaining <= 0:
+                break
+            watch.wait(remaining)
 
     logger.warning("Timed out waiting for port to reappear (%ds total)", timeout_total)
     return None
@@ -177,8 +338,31 @@ def reset_via_jlink(device: str | None = None, interface: str = "SWD",
         os.unlink(script_path)
 
 
+# ftdi_sio holds partial packets for up to latency_timer ms (default 16),
+# which puts a floor under every ISP command/ACK round-trip.
+_LATENCY_TIMER = "/sys/bus/usb-serial/devices/{}/latency_timer"
+
+
+def _lower_latency_timer(port: str) -> None:
+    """Best-effort: set an FTDI port's latency timer to 1 ms (Linux only).
+
+    Silently does nothing for non-FTDI ports, other platforms, or when the
+    sysfs attribute isn't writable by this user.
+    """
+    path = _LATENCY_TIMER.format(os.path.basename(os.path.realpath(port)))
+    try:
+        with open(path) as f:
+            if f.read().strip() == "1":
+                return
+        with open(path, "w") as f:
+            f.write("1")
+    except OSError:
+        pass
+
+
 def open_serial(port: str, retries: int = 3, retry_delay: float = 2) -> serial.Serial:
     """Open serial port with retries (port may disappear during power cycle)."""
+    _lower_latency_timer(port)
     for attempt in range(retries):
         try:
             ser = serial.Serial(port, BAUD_RATE, timeout=2)
@@ -387,45 +571,80 @@ def enter_maintenance(port: str, do_wait_for_replug: bool = False,
 
 
 def _write_segment(ser: serial.Serial, data: bytes, addr: int,
-                    name: str, seg_label: str = "") -> dict:
-    """Write one BURN_MRAM segment using an existing serial connection."""
-    size = len(data)
+                    name: str, seg_label: str = "",
+                    window: int | None = None,
+                    padded_size: int | None = None) -> dict:
+    """Write one BURN_MRAM segment using an existing serial connection.
+
+    Up to ``window`` DOWNLOAD_DATA frames are kept in flight before waiting
+    for the oldest ACK (default: DOWNLOAD_WINDOW). A window of 1 is plain
+    stop-and-wait.
+
+    If ``padded_size`` exceeds len(data), the difference is sent as zeros
+    in the final chunk(s) so the caller never has to copy data to pad it.
+    """
+    data_len = len(data)
+    size = max(padded_size or 0, data_len)
     label = f"[{name}]{seg_label}"
+    window = max(1, window or DOWNLOAD_WINDOW)
     logger.info("%s %d bytes -> 0x%08X", label, size, addr)
 
     ok, _ = send_cmd(ser, CMD_BURN_MRAM,
-                     struct.pack('<II', addr, size), "BURN_MRAM")
+                     _BURN_STRUCT.pack(addr, size), "BURN_MRAM")
     if not ok:
         return {"success": False, "message": f"BURN_MRAM rejected at 0x{addr:08X}"}
 
-    offset = 0
-    chunk_num = 0
+    chunk_num = 0  # next chunk to send
+    acked = 0      # chunks acknowledged so far
     total = (size + DATA_PER_CHUNK - 1) // DATA_PER_CHUNK
     t0 = time.time()
-
-    while offset < size:
-        chunk = data[offset:offset + DATA_PER_CHUNK]
-        seq = struct.pack('<H', chunk_num)
-        pkt = make_packet(CMD_DOWNLOAD_DATA, seq + chunk)
-        ser.reset_input_buffer()
-        ser.write(pkt)
-        ser.flush()
-        time.sleep(0.02)
+    next_progress = t0 + PROGRESS_INTERVAL
+
+    # One DOWNLOAD_DATA frame reused for every chunk
+    pkt = _new_download_frame()
+    pkt_view = memoryview(pkt)
+
+    batch = bytearray()
+
+    while acked < total:
+        # Frames that fit in the window go out in a single write() call;
+        # stop-and-wait writes the frame buffer directly.
+        while chunk_num < total and chunk_num - acked < window:
+            offset = chunk_num * DATA_PER_CHUNK
+            chunk = data[offset:offset + DATA_PER_CHUNK]
+            end = min(offset + DATA_PER_CHUNK, size)
+            if end > data_len:
+                chunk = bytes(chunk) + b'\x00' * (end - max(offset, data_len))
+            pkt_len = _fill_download_frame(pkt, chunk_num, chunk)
+            if window == 1:
+                ser.write(pkt_view[:pkt_len])
+            else:
+                batch += pkt_view[:pkt_len]
+            chunk_num += 1
+        if batch:
+            ser.write(batch)
+            batch.clear()
+        # No flush() (tcdrain) here — the ACK can't arrive before the frame
+        # has gone out, so the read below already waits for the TX FIFO.
 
         resp_cmd, _ = read_response(ser, timeout=1)
         if resp_cmd not in (CMD_ACK, CMD_DATA_RESP):
             status = f"0x{resp_cmd:02X}" if resp_cmd else "no response"
-            logger.warning("%s chunk %d/%d: %s", label, chunk_num, total, status)
+            logger.warning("%s chunk %d/%d: %s", label, acked, total, status)
+            _drain(ser)
             return {"success": False, "usb_drop": resp_cmd is None,
-                    "message": f"Chunk {chunk_num}/{total} failed: {status}",
-                    "chunks_written": chunk_num, "bytes_written": offset}
-
-        offset += len(chunk)
-        chunk_num += 1
-        if chunk_num % 100 == 0 or chunk_num == total:
-            elapsed = time.time() - t0
-            pct = 100 * offset // size
-            logger.info("%s %d/%d (%d%%) [%.1fs]", label, chunk_num, total, pct, elapsed)
+                    "message": f"Chunk {acked}/{total} failed: {status}",
+                    "chunks_written": acked,
+                    "bytes_written": min(acked * DATA_PER_CHUNK, size)}
+
+        acked += 1
+        # Progress is rate-limited by time, not chunk count; the last
+        # chunk is always reported.
+        now = time.time()
+        if now >= next_progress or acked == total:
+            next_progress = now + PROGRESS_INTERVAL
+            pct = 100 * min(acked * DATA_PER_CHUNK, size) // size
+            logger.info("%s %d/%d (%d%%) [%.1fs]", label, acked, total, pct, now - t0)
 
     send_cmd(ser, CMD_DOWNLOAD_DONE, label="DOWNLOAD_DONE")
     seg_elapsed = time.time() - t0
@@ -439,15 +658,63 @@ def _write_segment(ser: serial.Serial, data: bytes, addr: int,
 MAX_SEGMENT_SIZE = 256 * 1024
 
 
-def write_image(port: str, path: str, addr: int) -> dict:
-    """Write a single image to MRAM, splitting into segments with reconnect on USB drop."""
+# Image contents kept between flashes, least recently used first. Keyed by
+# (path, mtime_ns, size) so a rebuilt image is re-read; bounded by total
+# bytes since the server process lives as long as the MCP session.
+IMAGE_CACHE_BYTES = 32 * 1024 * 1024
+_image_cache: collections.OrderedDict[tuple[str, int, int], bytes] = collections.OrderedDict()
+_image_cache_lock = threading.Lock()
+
+
+def _load_image(path: str, cache: bool = True) -> bytes:
+    """Read an image file, reusing the cached copy if it is unchanged on disk.
+
+    Pass cache=False for generated/staging files so they don't evict images.
+    """
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _image_cache_lock:
+        data = _image_cache.get(key)
+        if data is not None:
+            _image_cache.move_to_end(key)
+            return data
     with open(path, 'rb') as f:
         data = f.read()
+    if cache and len(data) <= IMAGE_CACHE_BYTES:
+        with _image_cache_lock:
+            for stale in [k for k in _image_cache if k[0] == path]:
+                del _image_cache[stale]
+            _image_cache[key] = data
+            total = sum(map(len, _image_cache.values()))
+            while total > IMAGE_CACHE_BYTES:
+                _, old = _image_cache.popitem(last=False)
+                total -= len(old)
+    return data
+
+
+def clear_image_cache() -> None:
+    """Drop all cached image contents."""
+    with _image_cache_lock:
+        _image_cache.clear()
+
+
+def write_image(port: str, path: str, addr: int, data: bytes | None = None) -> dict:
+    """Write a single image to MRAM, splitting into segments with reconnect on USB drop.
+
+    ``data`` is the already-loaded file contents; if omitted the file is
+    read here. Repeated flashes of an unchanged file reuse the cached
+    contents; segments and chunks are memoryview slices of it, never copies.
+    """
+    if data is None:
+        data = _load_image(path)
+    return _write_image_data(port, memoryview(data), addr, os.path.basename(path))
+
+
+def _write_image_data(port: str, data: memoryview, addr: int, name: str) -> dict:
+    """Write image contents to MRAM, zero-padded to 16 bytes in the final chunk."""
     orig = len(data)
     pad = (16 - (orig % 16)) % 16
-    data += b'\x00' * pad
-    size = len(data)
-    name = os.path.basename(path)
+    size = orig + pad
 
     logger.info("[%s] %d bytes (padded to %d) -> 0x%08X", name, orig, size, addr)
 
@@ -464,12 +731,14 @@ def write_image(port: str, path: str, addr: int) -> dict:
         return {"success": False, "file": name, "message": "START_ISP failed"}
 
     try:
-        while seg_offset < size:
+        while seg_offset < orig:
             seg_data = data[seg_offset:seg_offset + MAX_SEGMENT_SIZE]
+            seg_pad = pad if seg_offset + MAX_SEGMENT_SIZE >= orig else 0
             seg_addr = addr + seg_offset
             seg_label = f" seg {seg_num + 1}/{num_segments}" if num_segments > 1 else ""
 
-            r = _write_segment(ser, seg_data, seg_addr, name, seg_label)
+            r = _write_segment(ser, seg_data, seg_addr, name, seg_label,
+                               padded_size=len(seg_data) + seg_pad)
             if not r["success"]:
                 if r.get("usb_drop"):
                     # USB dropped — close, wait, reconnect, retry this segment
@@ -518,35 +787,34 @@ def write_image(port: str, path: str, addr: int) -> dict:
 def flash_images(port: str, config_path: str, enter_maint: bool = False,
                   do_wait_for_replug: bool = False, jlink_reset: bool = False,
                   wait_for_power_cycle: bool = False, power_cycle_timeout: float = 15.0,
-                  device: str | None = None) -> dict:
-    """Flash ATOC package and all images defined in the ATOC JSON config."""
-    import json
+                  device: str | None = None, config: dict | None = None) -> dict:
+    """Flash ATOC package and all images defined in the ATOC JSON config.
+
+    config_path locates the build directory; pass config to reuse an
+    already-parsed copy of that file instead of reading it again.
+    """
     from . import devices
 
     cfg = devices.get_config(device)
     system_mram_base = cfg["system_mram_base"]
 
-    if enter_maint:
-        maint_result = enter_maintenance(
-            port, do_wait_for_replug=do_wait_for_replug, jlink_reset=jlink_reset,
-            wait_for_power_cycle=wait_for_power_cycle,
-            power_cycle_timeout=power_cycle_timeout)
-        if not maint_result["success"]:
-            return {"success": False, "message": "Failed to enter maintenance mode",
-                    "maintenance": maint_result}
-        time.sleep(1)
-
-    with open(config_path) as f:
-        config = json.load(f)
+    # Config and image checks run before maintenance so a bad config fails
+    # before the user is asked to power-cycle the board.
+    if config is None:
+        with open(config_path, "rb") as f:
+            config = jsonio.loads(f.read())
 
     build_dir = os.path.normpath(os.path.join(os.path.dirname(config_path), ".."))
     images_dir = os.path.join(build_dir, "images")
     atoc_path = os.path.join(build_dir, "AppTocPackage.bin")
 
-    images = []
+    images = []  # (path, addr, size), each file stat'ed once
     erase_path = None
-    if os.path.exists(atoc_path):
-        atoc_size = os.path.getsize(atoc_path)
+    try:
+        atoc_size = os.stat(atoc_path).st_size
+    except OSError:
+        atoc_size = None
+    if atoc_size is not None:
         atoc_addr = system_mram_base - atoc_size
         logger.info("ATOC: %d bytes -> 0x%08X", atoc_size, atoc_addr)
 
@@ -558,10 +826,10 @@ def flash_images(port: str, config_path: str, enter_maint: bool = False,
         erase_path = os.path.join(build_dir, ".atoc_erase.bin")
         with open(erase_path, 'wb') as zf:
             zf.write(b'\x00' * ATOC_ERASE_PAD)
-        images.append((erase_path, erase_addr))
+        images.append((erase_path, erase_addr, ATOC_ERASE_PAD))
         logger.info("ATOC erase: %d bytes of zeros -> 0x%08X", ATOC_ERASE_PAD, erase_addr)
 
-        images.append((atoc_path, atoc_addr))
+        images.append((atoc_path, atoc_addr, atoc_size))
     else:
         return {"success": False, "message": f"AppTocPackage.bin not found at {atoc_path} — run gen_toc first"}
 
@@ -575,23 +843,45 @@ def flash_images(port: str, config_path: str, enter_maint: bool = False,
         if binary and addr_str:
             path = os.path.join(images_dir, binary)
             addr = int(addr_str, 16)
-            if not os.path.exists(path):
+            try:
+                size = os.stat(path).st_size
+            except OSError:
                 return {"success": False, "message": f"Image not found: {path}"}
-            images.append((path, addr))
+            images.append((path, addr, size))
 
     if not images:
         return {"success": False, "message": "No images found in config"}
 
-    total_bytes = sum(os.path.getsize(p) for p, _ in images)
+    total_bytes = sum(size for *_, size in images)
 
-    t0 = time.time()
     results = []
-    for path, addr in images:
-        r = write_image(port, path, addr)
-        results.append(r)
-        if not r["success"]:
-            return {"success": False, "message": f"Failed writing {r['file']}",
-                    "images": results}
+    # Read the next image from disk while the UART is busy with the current
+    # one. Only file loads run on the worker; the serial port stays on this thread.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(_load_image, images[0][0], images[0][0] != erase_path)
+
+        # The first image loads while maintenance mode is entered
+        if enter_maint:
+            maint_result = enter_maintenance(
+                port, do_wait_for_replug=do_wait_for_replug, jlink_reset=jlink_reset,
+                wait_for_power_cycle=wait_for_power_cycle,
+                power_cycle_timeout=power_cycle_timeout)
+            if not maint_result["success"]:
+                return {"success": False, "message": "Failed to enter maintenance mode",
+                        "maintenance": maint_result}
+            time.sleep(1)
+
+        t0 = time.time()
+        for i, (path, addr, _) in enumerate(images):
+            data = pending.result()
+            if i + 1 < len(images):
+                next_path = images[i + 1][0]
+                pending = pool.submit(_load_image, next_path, next_path != erase_path)
+            r = write_image(port, path, addr, data=data)
+            results.append(r)
+            if not r["success"]:
+                return {"success": False, "message": f"Failed writing {r['file']}",
+                        "images": results}
 
     total_time = time.time() - t0
 
@@ -670,7 +960,7 @@ def gen_toc(setools_dir: str, config_rel: str,
     global_cfg_path = os.path.join(setools_dir, "utils", "global-cfg.db")
     if "global_cfg" in cfg and os.path.isdir(os.path.dirname(global_cfg_path)):
         with open(global_cfg_path, "w") as f:
-            _json.dump(cfg["global_cfg"], f, indent=4)
+            _json.dump(devices.as_dict(cfg["global_cfg"]), f, indent=4)
 
     result = subprocess.run(
         ["./app-gen-toc", "-f", config_rel],
@@ -724,12 +1014,15 @@ def monitor(port: str, baud: int = 115200, duration: float = 15,
                 ser.close()
                 return {"success": False, "message": f"JLink reset failed: {r['message']}"}
 
-        buf = b''
+        # Block in read() for up to 200 ms per batch rather than spinning
+        # on in_waiting — one syscall per burst of console output.
+        ser.timeout = max(0.0, min(0.2, duration))
+        buf = bytearray()
         t0 = time.time()
         while time.time() - t0 < duration:
-            data = ser.read(ser.in_waiting or 1)
+            data = ser.read(8192)
             if data:
-                buf += data
+                buf.extend(data)
 
         text = buf.decode('utf-8', errors='replace')
         return {
@@ -6,21 +6,31 @@ due to erase cycles). Both use the same loadbin command — J-Link routes
 writes to OSPI addresses (>= 0xC0000000) through the flash algorithm
 automatically via the FlashBankInfo in Devices.xml.
 
+When pylink is importable, flash_images does the same downloads over a
+single in-process libjlinkarm session and only falls back to JLinkExe if
+the probe can't be opened (or for OSPI range erase).
+
 Requires one-time setup: Devices.xml + AlifE7.JLinkScript installed to
 ~/Library/Application Support/SEGGER/JLinkDevices/AlifSemi/.
 For OSPI: Ensemble_IS25WX256.FLM must also be present (from Segger's
 Alif device pack).
 """
 
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
 import logging
 import os
 import re
 import shutil
 import subprocess
 import tempfile
+import threading
 import time
+from collections.abc import Callable, Iterable, Iterator
 
-from . import devices
+from . import devices, jsonio
 
 logger = logging.getLogger(__name__)
 
@@ -40,23 +50,59 @@ JLINK_DEVICES_DIR = os.path.expanduser(
 )
 JLINK_SCRIPT_FILE = os.path.join(JLINK_DEVICES_DIR, _DEFAULT_CFG["jlink_script"])
 
-# MRAM layout — E7 defaults (use devices.get_config(device) for other boards)
-MRAM_LAYOUT = dict(_DEFAULT_CFG["mram_layout"])
+# MRAM layout — E7 defaults (use devices.get_config(device) for other boards).
+# Read-only: callers needing a different layout pass layout= to flash_images.
+MRAM_LAYOUT = _DEFAULT_CFG["mram_layout"]
+
+# Maps ATOC JSON keys to component names (read-only)
+ATOC_KEY_MAP = _DEFAULT_CFG["atoc_key_map"]
+
+
+# JLinkExe output: file being loaded, and status markers checked per line.
+# The output is plain ASCII, so case variants are listed rather than
+# lower()-ing every line.
+_DOWNLOAD_RE = re.compile(r"Downloading file \[(.+?)\]")
+_UNSUPPORTED_TOKENS = ("unsupported format", "Unsupported format")
+_FAIL_TOKENS = ("Writing target memory failed",) + _UNSUPPORTED_TOKENS
+_JLINK_MARKERS = ("Could not connect", "No J-Link found",
+                  "Verify successful", "Verify failed") + _FAIL_TOKENS
+# Lines of JLinkExe output kept for error reporting
+_STDOUT_TAIL_LINES = 64
+
+# Negotiated interface speed (kHz) per device + probe + JLinkExe build; see _jlink_speed
+SPEED_CACHE = os.path.expanduser("~/.cache/alif-flash/probe_speed.json")
+_SPEED_RE = re.compile(r"interface speed:\s*(\d+)\s*kHz", re.IGNORECASE)
+_speed_cache: dict | None = None
+_speed_lock = threading.Lock()
+
+# JLinkExe exit/cancel polling backoff bounds (seconds)
+_POLL_MIN = 0.001
+_POLL_MAX = 0.1
+
 
-# Maps ATOC JSON keys to component names
-ATOC_KEY_MAP = dict(_DEFAULT_CFG["atoc_key_map"])
+# jlink/ data directory shipped with this package
+_JLINK_DATA_DIR = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "jlink"))
 
 
 def _jlink_data_dir() -> str:
     """Path to the jlink/ data directory shipped with this package."""
-    return os.path.join(os.path.dirname(__file__), "..", "..", "jlink")
+    return _JLINK_DATA_DIR
 
 
 OSPI_FLM_NAME = "Ensemble_IS25WX256.FLM"
 
+# Installed J-Link device files
+_XML_PATH = os.path.join(JLINK_DEVICES_DIR, "Devices.xml")
+_FLM_PATH = os.path.join(JLINK_DEVICES_DIR, OSPI_FLM_NAME)
+
 # Addresses at or above this threshold are routed through the flash loader
 OSPI_ADDR_THRESHOLD = 0xA0000000
 
+# Typical programming rates (bytes/s), used only for progress ETAs
+MRAM_WRITE_RATE = 44_000
+OSPI_WRITE_RATE = 7_000
+
 # OSPI flash erase sector size (IS25WX256/512 use 64KB sectors)
 OSPI_ERASE_SECTOR = 0x10000
 
@@ -86,27 +132,35 @@ def _atoc_warnings(layout: dict) -> list[str]:
     return warnings
 
 
+def _device_dir_names() -> set[str]:
+    """Names in JLINK_DEVICES_DIR, from one directory listing."""
+    try:
+        with os.scandir(JLINK_DEVICES_DIR) as it:
+            return {e.name for e in it}
+    except OSError:
+        return set()
+
+
 def check_setup(device: str | None = None) -> dict:
     """Check if JLinkExe and device definition are installed."""
     cfg = devices.get_config(device)
     issues = []
     warnings = []
 
-    if not os.path.exists(JLINK_EXE):
+    if not os.access(JLINK_EXE, os.X_OK):
         issues.append(f"JLinkExe not found at {JLINK_EXE}")
 
-    xml_path = os.path.join(JLINK_DEVICES_DIR, "Devices.xml")
     script_path = os.path.join(JLINK_DEVICES_DIR, cfg["jlink_script"])
-    flm_path = os.path.join(JLINK_DEVICES_DIR, OSPI_FLM_NAME)
 
-    if not os.path.exists(xml_path):
-        issues.append(f"Devices.xml not found at {xml_path}")
-    if not os.path.exists(script_path):
+    installed = _device_dir_names()
+    if "Devices.xml" not in installed:
+        issues.append(f"Devices.xml not found at {_XML_PATH}")
+    if cfg["jlink_script"] not in installed:
         issues.append(f"AlifE7.JLinkScript not found at {script_path}")
 
-    if not os.path.exists(flm_path):
+    if OSPI_FLM_NAME not in installed:
         warnings.append(
-            f"OSPI flash loader ({OSPI_FLM_NAME}) not found at {flm_path}. "
+            f"OSPI flash loader ({OSPI_FLM_NAME}) not found at {_FLM_PATH}. "
             "MRAM programming works without it. For OSPI support, install "
             "from Segger's Alif Ensemble device pack."
         )
@@ -122,25 +176,42 @@ def check_setup(device: str | None = None) -> dict:
     return result
 
 
+# Devices whose J-Link setup has been confirmed (or installed) by flash_images
+_setup_ready: set[str | None] = set()
+
+
 def install_device_def(device: str | None = None) -> dict:
     """Install Devices.xml + JLinkScript to SEGGER user directory."""
     cfg = devices.get_config(device)
-    src_dir = _jlink_data_dir()
+    src_dir = _JLINK_DATA_DIR
     os.makedirs(JLINK_DEVICES_DIR, exist_ok=True)
 
     copied = []
+    skipped = []  # already installed and up to date
     for name in ("Devices.xml", cfg["jlink_script"]):
         src = os.path.join(src_dir, name)
         dst = os.path.join(JLINK_DEVICES_DIR, name)
-        if not os.path.exists(src):
+        try:
+            src_st = os.stat(src)
+        except OSError:
             return {"success": False, "message": f"Source file not found: {src}"}
-        shutil.copy2(src, dst)
         copied.append(name)
+        try:
+            dst_st = os.stat(dst)
+        except OSError:
+            dst_st = None
+        # copy2 preserves mtime, so an unchanged install matches size and mtime
+        if (dst_st is not None and dst_st.st_size == src_st.st_size
+                and dst_st.st_mtime >= src_st.st_mtime):
+            skipped.append(name)
+            continue
+        shutil.copy2(src, dst)
 
     result = {"success": True, "installed": copied, "dest": JLINK_DEVICES_DIR}
+    if skipped:
+        result["skipped"] = skipped
 
-    flm_path = os.path.join(JLINK_DEVICES_DIR, OSPI_FLM_NAME)
-    if not os.path.exists(flm_path):
+    if not os.path.exists(_FLM_PATH):
         result["note"] = (
             f"OSPI flash loader ({OSPI_FLM_NAME}) not found. "
             "MRAM programming works without it. For OSPI support, install "
@@ -150,188 +221,713 @@ def install_device_def(device: str | None = None) -> dict:
     return result
 
 
-def _run_jlink(script_content: str, device: str | None = None, timeout: int = 120) -> dict:
-    """Run JLinkExe with a command script. Returns parsed output."""
+@contextlib.contextmanager
+def _script_file(script_content: str) -> Iterator[str]:
+    """Yield a path JLinkExe can read the command script from.
+
+    On Linux the script lives in an anonymous memfd, opened by the child
+    through /proc/<pid>/fd, so nothing touches the filesystem. Elsewhere
+    (macOS) it is a temp file removed on exit.
+    """
+    data = script_content.encode()
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("jlink_script", os.MFD_CLOEXEC)
+        try:
+            os.write(fd, data)
+            yield f"/proc/{os.getpid()}/fd/{fd}"
+        finally:
+            os.close(fd)
+        return
+
+    # Raw fd write: one syscall, no text-wrapper buffering
+    fd, script_path = tempfile.mkstemp(suffix=".jlink")
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    try:
+        yield script_path
+    finally:
+        os.unlink(script_path)
+
+
+def _probe_max_speed(device: str | None = None,
+                     serial: str | None = None) -> int | None:
+    """Connect once with -speed auto and return the negotiated speed in kHz."""
+    cfg = devices.get_config(device)
+    cmd = [JLINK_EXE, "-device", cfg["jlink_device"], "-if", INTERFACE,
+           "-speed", "auto", "-autoconnect", "1", "-NoGui", "1"]
+    if serial:
+        cmd.extend(["-USB", serial])
+    try:
+        with _script_file("exit\n") as script_path:
+            result = subprocess.run(
+                cmd + ["-CommandFile", script_path],
+                capture_output=True, text=True, timeout=30,
+            )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    m = _SPEED_RE.search(result.stdout)
+    return int(m.group(1)) if m else None
+
+
+def _jlink_speed(device: str | None = None, serial: str | None = None) -> str:
+    """Interface speed to pass to J-Link.
+
+    With SPEED = "auto", the speed J-Link negotiates is probed once per
+    device, probe and JLinkExe build and cached in SPEED_CACHE, so later
+    runs pin it instead of renegotiating. Falls back to "auto" if the probe
+    fails; failures aren't cached, so the next run probes again.
+    """
+    global _speed_cache
+    if SPEED != "auto":
+        return str(SPEED)
+    try:
+        build = os.stat(JLINK_EXE).st_mtime_ns
+    except OSError:
+        return SPEED
+    key = f"{device or devices.DEFAULT_DEVICE}@{build}"
+    if serial:
+        key += f"@{serial}"
+
+    # Parallel flashing can resolve the speed for two probes at once
+    with _speed_lock:
+        if _speed_cache is None:
+            try:
+                with open(SPEED_CACHE, "rb") as f:
+                    _speed_cache = jsonio.loads(f.read())
+            except (OSError, ValueError):
+                _speed_cache = {}
+        khz = _speed_cache.get(key)
+        if khz:
+            return str(khz)
+        khz = _probe_max_speed(device, serial)
+        logger.info("J-Link interface speed for %s: %s kHz", key, khz or "auto")
+        if not khz:
+            return SPEED
+        _speed_cache[key] = khz
+        try:
+            os.makedirs(os.path.dirname(SPEED_CACHE), exist_ok=True)
+            tmp = SPEED_CACHE + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(jsonio.dumps(_speed_cache))
+            os.replace(tmp, SPEED_CACHE)
+        except OSError as e:
+            logger.warning("Could not save J-Link speed cache: %s", e)
+    return str(khz)
+
+
+def _run_jlink(script_content: str, device: str | None = None, timeout: int = 120,
+               on_file_start: Callable[[str], None] | None = None,
+               should_cancel: Callable[[], bool] | None = None,
+               serial: str | None = None) -> dict:
+    """Run JLinkExe with a command script.
+
+    Output is parsed line by line as it arrives, so per-file results are
+    logged live and only a short tail of the log is kept for errors.
+    on_file_start is called with the file name when a download begins.
+    If should_cancel returns True while JLinkExe runs, it is terminated.
+    serial selects a specific J-Link by USB serial number.
+    """
     cfg = devices.get_config(device)
     jlink_device = cfg["jlink_device"]
     jlink_script_path = os.path.join(JLINK_DEVICES_DIR, cfg["jlink_script"])
 
-    with tempfile.NamedTemporaryFile(
-        mode="w", suffix=".jlink", delete=False
-    ) as f:
-        f.write(script_content)
-        script_path = f.name
+    script_file = contextlib.ExitStack()
+    script_path = script_file.enter_context(_script_file(script_content))
 
     try:
         cmd = [JLINK_EXE, "-device", jlink_device, "-if", INTERFACE,
-               "-speed", str(SPEED), "-autoconnect", "1",
+               "-speed", _jlink_speed(device, serial), "-autoconnect", "1",
                "-NoGui", "1",
                "-CommandFile", script_path]
         # JLink V9.20 doesn't resolve JLinkScriptFile from Devices.xml
         # correctly — pass it explicitly on the command line.
         if os.path.exists(jlink_script_path):
             cmd.extend(["-JLinkScriptFile", jlink_script_path])
-        result = subprocess.run(
-            cmd, capture_output=True, text=True, timeout=timeout,
+        if serial:
+            cmd.extend(["-USB", serial])
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, bufsize=1,
         )
-        stdout = result.stdout
-
-        # Check for real connection failures (not "Failed to halt CPU" which is expected)
-        if "Could not connect" in stdout or "No J-Link found" in stdout:
-            return {"success": False, "message": "J-Link not connected",
-                    "stdout": stdout[-1000:]}
-        if "Writing target memory failed" in stdout:
-            return {"success": False, "message": "MRAM write failed",
-                    "stdout": stdout[-1000:]}
-        if "unsupported format" in stdout.lower():
-            return {"success": False, "message": "File format rejected by JLinkExe (extension issue)",
-                    "stdout": stdout[-1000:]}
-
-        # "Failed to halt CPU" is normal — writes succeed anyway
-        ok = True
-
-        return {"success": ok, "returncode": result.returncode,
-                "stdout": stdout, "stderr": result.stderr}
-    except subprocess.TimeoutExpired:
-        return {"success": False, "message": f"JLinkExe timed out after {timeout}s"}
     except FileNotFoundError:
+        script_file.close()
         return {"success": False, "message": f"JLinkExe not found at {JLINK_EXE}"}
+
+    tail = collections.deque(maxlen=_STDOUT_TAIL_LINES)
+    seen = set()
+
+    def lines() -> Iterator[str]:
+        for line in proc.stdout:
+            tail.append(line)
+            seen.update(m for m in _JLINK_MARKERS if m in line)
+            if "Verify failed" in seen and proc.poll() is None:
+                # No point reading back the remaining images
+                logger.warning("verifybin failed: %s", line.strip())
+                proc.terminate()
+            yield line
+
+    stopped = []  # reason the watchdog ended the process, if it did
+
+    def watchdog():
+        # Poll with exponential backoff: quick to notice a short run or a
+        # cancel, near-idle during multi-minute OSPI writes.
+        deadline = time.monotonic() + timeout
+        delay = _POLL_MIN
+        while True:
+            try:
+                proc.wait(timeout=delay)
+                return
+            except subprocess.TimeoutExpired:
+                pass
+            if should_cancel is not None and should_cancel():
+                stopped.append("cancelled")
+                proc.terminate()
+                return
+            if time.monotonic() >= deadline:
+                stopped.append(f"timed out after {timeout}s")
+                proc.kill()
+                return
+            delay = min(delay * 2, _POLL_MAX)
+
+    watcher = threading.Thread(target=watchdog, daemon=True)
+    watcher.start()
+    try:
+        files = []
+        for r in _parse_loadbin_stream(lines(), on_file_start):
+            logger.info("  %s: %s", r["file"], "O.K." if r["success"] else r["error"])
+            files.append(r)
+        returncode = proc.wait()
+        watcher.join()
     finally:
-        os.unlink(script_path)
+        proc.stdout.close()
+        script_file.close()
 
+    if stopped:
+        return {"success": False, "message": f"JLinkExe {stopped[0]}"}
 
-def _parse_loadbin_output(stdout: str) -> list[dict]:
-    """Parse JLinkExe output to extract per-file results."""
-    results = []
+    stdout = "".join(tail)[-1000:]
+
+    # Check for real connection failures (not "Failed to halt CPU" which is expected)
+    if "Could not connect" in seen or "No J-Link found" in seen:
+        return {"success": False, "message": "J-Link not connected",
+                "stdout": stdout}
+    if "Writing target memory failed" in seen:
+        return {"success": False, "message": "MRAM write failed",
+                "stdout": stdout}
+    if not seen.isdisjoint(_UNSUPPORTED_TOKENS):
+        return {"success": False, "message": "File format rejected by JLinkExe (extension issue)",
+                "stdout": stdout}
+
+    # "Failed to halt CPU" is normal — writes succeed anyway
+    return {"success": True, "returncode": returncode, "stdout": stdout,
+            "files": files,
+            "verified": "Verify successful" in seen and "Verify failed" not in seen}
+
+
+class _JLinkSession:
+    """In-process J-Link connection via pylink (libjlinkarm).
+
+    Opens the probe, selects the device and connects once, so every
+    loadbin-equivalent in a flash session shares the DLL init, device
+    select and halt that JLinkExe repeats on each invocation.
+    """
+
+    VERIFY_CHUNK = 0x10000
+
+    def __init__(self, device: str | None = None, serial_no: str | None = None):
+        import pylink  # ImportError -> caller falls back to JLinkExe
+
+        cfg = devices.get_config(device)
+        self._jlink_device = cfg["jlink_device"]
+        self._serial_no = serial_no
+        # Resolved before the probe is opened (a speed probe runs JLinkExe)
+        self._speed = _jlink_speed(device, serial_no)
+        self._script_path = os.path.join(JLINK_DEVICES_DIR, cfg["jlink_script"])
+        self._pylink = pylink
+        self.jlink = pylink.JLink()
+
+    def open(self) -> None:
+        jl = self.jlink
+        # Find emulator explicitly — jlink.open() with no args can fail
+        # in subprocess contexts (e.g., MCP server)
+        if self._serial_no:
+            jl.open(serial_no=int(self._serial_no))
+        else:
+            emulators = jl.connected_emulators()
+            if not emulators:
+                raise RuntimeError("No J-Link emulators found")
+            jl.open(serial_no=emulators[0].SerialNumber)
+        try:
+            # Same workaround as _run_jlink: pass the script explicitly
+            if os.path.exists(self._script_path):
+                jl.exec_command(f"ScriptFile = {self._script_path}")
+            jl.set_tif(self._pylink.enums.JLinkInterfaces.SWD)
+            speed = self._speed
+            jl.connect(self._jlink_device, speed=int(speed) if speed.isdigit() else speed)
+        except BaseException:
+            jl.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.jlink.close()
+        return False
+
+    def load(self, path: str, addr: int, data: bytes | None = None) -> dict:
+        """Download one file. OSPI addresses go through the FLM as with loadbin.
+
+        The DLL picks the file format from its extension, so anything that
+        isn't .bin (.dtb, .img, ...) is written as raw bytes instead: data
+        if the caller already has the contents, otherwise read from path.
+        """
+        try:
+            if path.endswith(".bin"):
+                self.jlink.flash_file(path, addr)
+            else:
+                self.jlink.flash(data if data is not None else _read_file(path), addr)
+        except self._pylink.errors.JLinkException as e:
+            return {"success": False, "error": str(e)}
+        return {"success": True}
+
+    def verify(self, data: bytes, addr: int) -> bool:
+        """Read target memory back and compare with data, stopping at the first mismatch."""
+        view = memoryview(data)
+        try:
+            for offset in range(0, len(view), self.VERIFY_CHUNK):
+                chunk = view[offset:offset + self.VERIFY_CHUNK]
+                if bytes(self.jlink.memory_read8(addr + offset, len(chunk))) != chunk:
+                    return False
+        except self._pylink.errors.JLinkException as e:
+            logger.warning("Verify readback at 0x%08X failed: %s", addr, e)
+            return False
+        return True
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _flash_in_process(load_files: list[tuple], verify: bool,
+                      device: str | None = None,
+                      on_file_start: Callable[[str], None] | None = None,
+                      serial_no: str | None = None,
+                      ) -> tuple[list[dict], bool | None] | None:
+    """Flash load_files over one pylink session.
+
+    Returns (file_results, verified), or None if pylink is unavailable or
+    the probe could not be connected — the caller then uses JLinkExe.
+    """
+    try:
+        session = _JLinkSession(device, serial_no)
+    except ImportError:
+        return None
+    try:
+        session.open()
+    except Exception as e:
+        logger.warning("pylink connect failed (%s), falling back to JLinkExe", e)
+        return None
+
+    def needs_data(path: str) -> bool:
+        return verify or not path.endswith(".bin")
+
+    with session, concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        # Each file is read at most once, shared by load and verify, and
+        # only one file ahead so the disk works while the current one
+        # downloads without holding every image in memory.
+        def prefetch(i: int):
+            path = load_files[i][1]
+            return pool.submit(_read_file, path) if needs_data(path) else None
+
+        pending = prefetch(0) if load_files else None
+        file_results = []
+        matches = []
+        all_loaded = True
+        for i, (comp, load_path, orig_path, addr, _) in enumerate(load_files):
+            data = pending.result() if pending else None
+            pending = prefetch(i + 1) if i + 1 < len(load_files) else None
+            if on_file_start:
+                on_file_start(os.path.basename(load_path))
+            r = {"file": os.path.basename(orig_path), **session.load(load_path, addr, data)}
+            logger.info("  %-10s %s", comp, "O.K." if r["success"] else r["error"])
+            file_results.append(r)
+            all_loaded = all_loaded and r["success"]
+            # Read back while the contents are in hand; stop once a download
+            # fails, since that failure is the error to report
+            if verify and all_loaded:
+                matches.append(session.verify(data, addr))
+        verified = all(matches) if verify and all_loaded else None
+    return file_results, verified
+
+
+def _parse_loadbin_stream(lines: Iterable[str],
+                          on_file_start: Callable[[str], None] | None = None,
+                          ) -> Iterator[dict]:
+    """Yield per-file results from JLinkExe output lines as they arrive."""
     # Match lines like: "Downloading file [/path/to/file.bin]..."
     # Followed by "O.K.", "Writing target memory failed.", or "unsupported format"
-    lines = stdout.split("\n")
     current_file = None
     for line in lines:
-        m = re.search(r"Downloading file \[(.+?)\]", line)
+        m = _DOWNLOAD_RE.search(line)
         if m:
             current_file = os.path.basename(m.group(1))
-        elif current_file and "O.K." in line:
-            results.append({"file": current_file, "success": True})
-            current_file = None
-        elif current_file and "Writing target memory failed" in line:
-            results.append({"file": current_file, "success": False, "error": line.strip()})
-            current_file = None
-        elif current_file and "unsupported format" in line.lower():
-            results.append({"file": current_file, "success": False, "error": line.strip()})
-            current_file = None
+            if on_file_start:
+                on_file_start(current_file)
+        elif current_file:
+            if "O.K." in line:
+                yield {"file": current_file, "success": True}
+                current_file = None
+            elif any(tok in line for tok in _FAIL_TOKENS):
+                yield {"file": current_file, "success": False, "error": line.strip()}
+                current_file = None
+
+
+def _parse_loadbin_output(stdout: str) -> list[dict]:
+    """Parse complete JLinkExe output to extract per-file results."""
+    return list(_parse_loadbin_stream(stdout.splitlines()))
+
+
+def _file_size(path: str) -> int | None:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+
+def _io_map(fn: Callable, items: list) -> list:
+    """list(map(fn, items)), run on a small thread pool for blocking file I/O.
+
+    Overlaps the round-trips when images live on a network mount.
+    """
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(items), 8)) as pool:
+        return list(pool.map(fn, items))
+
+
+def _file_sizes(paths: list[str]) -> list[int | None]:
+    """Sizes of paths (None if missing), stat'ed concurrently."""
+    return _io_map(_file_size, paths)
+
+
+def _ospi_erase_ranges(extents: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Sector-aligned erase ranges covering (addr, size) extents.
+
+    Only sectors an image touches are erased; overlapping or adjacent
+    ranges are merged so no sector is erased twice.
+    """
+    ranges = []
+    for addr, size in sorted(extents):
+        start = addr - addr % OSPI_ERASE_SECTOR
+        end = -(-(addr + size) // OSPI_ERASE_SECTOR) * OSPI_ERASE_SECTOR
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], max(end, ranges[-1][1]))
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+# Images last written by flash_images, keyed by device and address
+FLASH_MANIFEST = os.path.expanduser("~/.cache/alif-flash/manifest.json")
+
+
+def _manifest_key(device: str | None, addr: int) -> str:
+    return f"{device or devices.DEFAULT_DEVICE}@0x{addr:08X}"
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
 
-    return results
+
+def _load_manifest() -> dict:
+    try:
+        with open(FLASH_MANIFEST, "rb") as f:
+            return jsonio.loads(f.read())
+    except (OSError, ValueError):
+        return {}
+
+
+def _record_flash(manifest: dict, device: str | None, load_files: list[tuple],
+                  file_results: list[dict], digests: dict, verified: bool | None) -> None:
+    """Update FLASH_MANIFEST for the addresses just written.
+
+    Entries are dropped for any address written without a known digest or
+    that failed, so a later skip_unchanged run never trusts stale data.
+    """
+    ok = {r["file"] for r in file_results if r["success"]}
+    changed = False
+    for _, _, orig_path, addr, size in load_files:
+        key = _manifest_key(device, addr)
+        if os.path.basename(orig_path) in ok and key in digests:
+            manifest[key] = {"size": size, "sha256": digests[key], "verified": bool(verified)}
+            changed = True
+        elif manifest.pop(key, None) is not None:
+            changed = True
+    if not changed:
+        return
+    try:
+        os.makedirs(os.path.dirname(FLASH_MANIFEST), exist_ok=True)
+        tmp = FLASH_MANIFEST + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(jsonio.dumps(manifest))
+        os.replace(tmp, FLASH_MANIFEST)
+    except OSError as e:
+        logger.warning("Could not update flash manifest: %s", e)
+
+
+def _jlink_serials() -> list[str]:
+    """J-Link serial numbers from ALIF_JLINK_SERIALS (comma-separated)."""
+    return [s.strip() for s in os.environ.get("ALIF_JLINK_SERIALS", "").split(",")
+            if s.strip()]
+
+
+def _build_script(load_files: list[tuple], verify: bool, erase: bool) -> str:
+    """JLinkExe command script: optional OSPI erase, loadbins, verifybins."""
+    lines = []
+
+    # Pre-erase OSPI sectors to clear stale partition table data
+    if erase:
+        ranges = _ospi_erase_ranges(
+            (addr, size) for _, _, _, addr, size in load_files
+            if addr >= OSPI_ADDR_THRESHOLD)
+        for start, end in ranges:
+            logger.info("Pre-erasing OSPI region 0x%08X - 0x%08X (%d KB)",
+                        start, end, (end - start) // 1024)
+            lines.append(f"erase 0x{start:08X} 0x{end:08X}")
+        if ranges:
+            lines.append("")
+
+    for _, load_path, _, addr, _ in load_files:
+        lines.append(f"loadbin {load_path} 0x{addr:08X}")
+    if verify:
+        lines.append("")
+        for _, load_path, _, addr, _ in load_files:
+            lines.append(f"verifybin {load_path} 0x{addr:08X}")
+    lines.append("exit")
+    return "\n".join(lines) + "\n"
+
+
+def _jlink_timeout(load_files: list[tuple]) -> int:
+    """JLinkExe timeout scaled to the data size."""
+    # OSPI flash programming is ~7 KB/s (erase cycles) — scale timeout to data size
+    if any(addr >= OSPI_ADDR_THRESHOLD for _, _, _, addr, _ in load_files):
+        # ~7 KB/s + overhead for erase/verify. 2x safety margin.
+        return max(600, (sum(size for *_, size in load_files) // 3500) * 2)
+    return 300
+
+
+def _merge_jlink_runs(runs: list[dict]) -> dict:
+    """Combine concurrent _run_jlink results; the first failure wins."""
+    if len(runs) == 1:
+        return runs[0]
+    for r in runs:
+        if not r["success"]:
+            return r
+    return {"success": True, "files": [f for r in runs for f in r["files"]],
+            "verified": all(r["verified"] for r in runs),
+            "stdout": runs[-1]["stdout"]}
+
+
+def _stage_as_bin(src: str, tmp_dir: str) -> str:
+    """Make src available in tmp_dir under a .bin name without copying if possible.
+
+    Tries a hardlink, then a symlink, and only copies as a last resort
+    (data only: copyfile takes the kernel sendfile/copy_file_range path).
+    """
+    base = os.path.splitext(os.path.basename(src))[0] or os.path.basename(src)
+    dst = os.path.join(tmp_dir, base + ".bin")
+    try:
+        os.link(src, dst)
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(src), dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+    return dst
 
 
 def flash_images(image_dir: str, components: list[str] | None = None,
                  verify: bool = False, erase: bool = False,
-                 device: str | None = None, layout: dict | None = None) -> dict:
-    """Flash Linux images to MRAM via JLinkExe loadbin.
+                 device: str | None = None, layout: dict | None = None,
+                 skip_unchanged: bool = False,
+                 jlink_serial: str | None = None,
+                 should_cancel: Callable[[], bool] | None = None) -> dict:
+    """Flash Linux images to MRAM via J-Link.
+
+    Uses a single in-process pylink session when available, otherwise
+    JLinkExe loadbin.
 
     Args:
         image_dir: Directory containing the image files.
         components: List of components to flash (tfa, dtb, kernel, rootfs).
                     Defaults to all.
         verify: Run verifybin after each loadbin.
-        erase: Erase OSPI flash region before programming. Clears stale data
-               that MTD partition parsers (RedBoot/AFS) might misinterpret.
+        erase: Erase the OSPI sectors each image occupies before programming.
+               Clears stale data that MTD partition parsers (RedBoot/AFS)
+               might misinterpret.
         device: Target device name (default: alif-e7).
         layout: Custom MRAM layout dict. If None, uses device's default layout.
+        skip_unchanged: Skip images whose size and SHA-256 match what the last
+                        J-Link flash wrote at the same address (see
+                        FLASH_MANIFEST). Assumes nothing else rewrote them
+                        since, e.g. an SE-UART flash.
+        jlink_serial: Serial number of the J-Link to use (default: first found).
+                      With ALIF_JLINK_SERIALS="S1,S2" set, MRAM images go
+                      through S1 and OSPI images through S2 concurrently.
+        should_cancel: Polled while JLinkExe runs; returning True terminates
+                       it. In-process (pylink) downloads can't be interrupted,
+                       so cancellation takes effect before the next probe run.
     """
     if layout is None:
         cfg = devices.get_config(device)
         layout = cfg["mram_layout"]
 
-    # Auto-install device definition if needed
-    setup = check_setup(device=device)
-    if not setup["ready"]:
-        if any("JLinkExe" in i for i in setup["issues"]):
-            return {"success": False, "message": "JLinkExe not installed",
-                    "issues": setup["issues"]}
-        logger.info("Device definition not installed, installing...")
-        install_result = install_device_def(device=device)
-        if not install_result["success"]:
-            return {"success": False, "message": "Failed to install device definition",
-                    "detail": install_result}
+    # Auto-install device definition if needed (once per process per device)
+    if device not in _setup_ready:
+        setup = check_setup(device=device)
+        if not setup["ready"]:
+            if any("JLinkExe" in i for i in setup["issues"]):
+                return {"success": False, "message": "JLinkExe not installed",
+                        "issues": setup["issues"]}
+            logger.info("Device definition not installed, installing...")
+            install_result = install_device_def(device=device)
+            if not install_result["success"]:
+                return {"success": False, "message": "Failed to install device definition",
+                        "detail": install_result}
+        _setup_ready.add(device)
 
     if components is None:
         components = list(layout.keys())
 
     # Validate files
-    files_to_flash = []
     for comp in components:
         if comp not in layout:
             return {"success": False,
                     "message": f"Unknown component '{comp}'. Use: {', '.join(layout)}"}
-        info = layout[comp]
-        path = os.path.join(image_dir, info["file"])
-        if not os.path.exists(path):
+    paths = [os.path.join(image_dir, layout[comp]["file"]) for comp in components]
+    files_to_flash = []
+    for comp, path, size in zip(components, paths, _file_sizes(paths)):
+        if size is None:
             return {"success": False, "message": f"File not found: {path}"}
-        files_to_flash.append((comp, path, info["addr"]))
-
-    # JLinkExe loadbin rejects files with non-.bin extensions (.dtb, .img, etc.)
-    # Copy such files to a temp directory with .bin extension.
-    tmp_dir = None
-    load_files = []  # (comp, load_path, orig_path, addr) — load_path may differ from orig
-    for comp, path, addr in files_to_flash:
-        if path.endswith(".bin"):
-            load_files.append((comp, path, path, addr))
-        else:
-            if tmp_dir is None:
-                tmp_dir = tempfile.mkdtemp(prefix="jlink_")
-            base = os.path.splitext(os.path.basename(path))[0] or os.path.basename(path)
-            tmp_path = os.path.join(tmp_dir, base + ".bin")
-            shutil.copy2(path, tmp_path)
-            load_files.append((comp, tmp_path, path, addr))
+        files_to_flash.append((comp, path, layout[comp]["addr"], size))
+
+    manifest = _load_manifest()
+    digests = {}
+    skipped = []
+    if skip_unchanged:
+        remaining = []
+        hashes = _io_map(_file_sha256, [path for _, path, _, _ in files_to_flash])
+        for (comp, path, addr, size), digest in zip(files_to_flash, hashes):
+            key = _manifest_key(device, addr)
+            digests[key] = digest
+            prev = manifest.get(key)
+            if (prev and prev["size"] == size and prev["sha256"] == digests[key]
+                    and (prev["verified"] or not verify)):
+                logger.info("  %-10s unchanged since last flash, skipping", comp)
+                skipped.append({"file": os.path.basename(path), "success": True,
+                                "skipped": True, "size_bytes": size})
+            else:
+                remaining.append((comp, path, addr, size))
+        files_to_flash = remaining
+        if not files_to_flash:
+            return {"success": True, "method": "skipped", "total_bytes": 0,
+                    "components": 0, "files": skipped, "verified": None,
+                    "message": "All images unchanged since last J-Link flash; nothing written."}
+
+    # (comp, load_path, orig_path, addr, size) — load_path may differ from orig
+    load_files = [(comp, path, path, addr, size) for comp, path, addr, size in files_to_flash]
+    tmp_dirs = []
+    stage_lock = threading.Lock()
+
+    def stage_for_jlinkexe(files: list[tuple]) -> list[tuple]:
+        # JLinkExe loadbin rejects files with non-.bin extensions (.dtb, .img,
+        # etc.), so stage those in a temp directory under a .bin name. The
+        # pylink path writes them as-is and never gets here.
+        to_stage = [lf for lf in files if not lf[1].endswith(".bin")]
+        if not to_stage:
+            return files
+        with stage_lock:
+            if not tmp_dirs:
+                # Same filesystem as the images so hardlinks work
+                try:
+                    tmp_dirs.append(tempfile.mkdtemp(prefix=".jlink_", dir=image_dir))
+                except OSError:
+                    tmp_dirs.append(tempfile.mkdtemp(prefix="jlink_"))
+            # Usually hardlinks; when they have to be copies, copy concurrently
+            staged = dict(zip(to_stage, _io_map(
+                lambda lf: _stage_as_bin(lf[1], tmp_dirs[0]), to_stage)))
+        for (_, _, _, addr, size), path in staged.items():
+            eta_info[os.path.basename(path)] = (size, addr)
+        return [(lf[0], staged[lf], *lf[2:]) if lf in staged else lf for lf in files]
 
     try:
-        # Build JLink command script
-        lines = []
-
-        # Pre-erase OSPI region to clear stale partition table data
-        if erase:
-            ospi_files = [(comp, lp, op, addr) for comp, lp, op, addr in load_files
-                          if addr >= OSPI_ADDR_THRESHOLD]
-            if ospi_files:
-                # Erase from lowest OSPI addr to end of highest file, rounded up to sector boundary
-                min_addr = min(addr for _, _, _, addr in ospi_files)
-                max_end = max(addr + os.path.getsize(op) for _, _, op, addr in ospi_files)
-                erase_end = ((max_end + OSPI_ERASE_SECTOR - 1) // OSPI_ERASE_SECTOR) * OSPI_ERASE_SECTOR
-                logger.info("Pre-erasing OSPI region 0x%08X - 0x%08X (%d KB)",
-                            min_addr, erase_end, (erase_end - min_addr) // 1024)
-                lines.append(f"erase 0x{min_addr:08X} 0x{erase_end:08X}")
-                lines.append("")
-
-        for comp, load_path, orig_path, addr in load_files:
-            lines.append(f"loadbin {load_path} 0x{addr:08X}")
-        if verify:
-            lines.append("")
-            for comp, load_path, orig_path, addr in load_files:
-                lines.append(f"verifybin {load_path} 0x{addr:08X}")
-        lines.append("exit")
-        script = "\n".join(lines) + "\n"
-
         # Calculate total size
-        total_bytes = sum(os.path.getsize(p) for _, _, p, _ in load_files)
+        total_bytes = sum(size for *_, size in load_files)
 
         logger.info("Flashing %d components (%d KB) via J-Link...",
                     len(load_files), total_bytes // 1024)
-        for comp, load_path, orig_path, addr in load_files:
-            size = os.path.getsize(orig_path)
+        for comp, _, orig_path, addr, size in load_files:
             logger.info("  %-10s %s @ 0x%08X (%d bytes)", comp, os.path.basename(orig_path), addr, size)
 
-        # OSPI flash programming is ~7 KB/s (erase cycles) — scale timeout to data size
-        has_ospi = any(addr >= OSPI_ADDR_THRESHOLD for _, _, _, addr in load_files)
-        if has_ospi:
-            # ~7 KB/s + overhead for erase/verify. 2x safety margin.
-            timeout = max(600, (total_bytes // 3500) * 2)
-        else:
-            timeout = 300
+        # With two J-Links configured, MRAM and OSPI images are written
+        # concurrently, one probe each.
+        serials = _jlink_serials()
+        mram_files = [lf for lf in load_files if lf[3] < OSPI_ADDR_THRESHOLD]
+        ospi_files = [lf for lf in load_files if lf[3] >= OSPI_ADDR_THRESHOLD]
+        parallel = len(serials) >= 2 and bool(mram_files) and bool(ospi_files)
+
+        # Log an ETA as each download starts so long OSPI writes show progress
+        eta_info = {os.path.basename(lp): (size, addr) for _, lp, _, addr, size in load_files}
+
+        def log_eta(name: str) -> None:
+            size, addr = eta_info.get(name, (0, 0))
+            rate = OSPI_WRITE_RATE if addr >= OSPI_ADDR_THRESHOLD else MRAM_WRITE_RATE
+            logger.info("  %s: %d KB, ETA ~%ds", name, size // 1024, size // rate)
+
+        def flash_group(files: list[tuple], serial: str | None) -> dict:
+            if should_cancel is not None and should_cancel():
+                return {"success": False, "message": "J-Link flash cancelled"}
+            # Prefer one in-process pylink session per probe; range erase is a
+            # JLinkExe command with no DLL equivalent, so erase runs keep the
+            # subprocess.
+            in_process = (None if erase
+                          else _flash_in_process(files, verify, device, log_eta,
+                                                 serial_no=serial))
+            if in_process is not None:
+                group_files, group_verified = in_process
+                return {"success": True, "files": group_files, "stdout": "",
+                        "verified": bool(group_verified), "in_process": True}
+            files = stage_for_jlinkexe(files)
+            run = _run_jlink(_build_script(files, verify, erase), device=device,
+                             timeout=_jlink_timeout(files),
+                             on_file_start=log_eta, should_cancel=should_cancel,
+                             serial=serial)
+            # Per-file results — map temp .bin names back to originals
+            tmp_to_orig = {os.path.basename(lp): os.path.basename(op)
+                           for _, lp, op, _, _ in files}
+            for r in run.get("files", ()):
+                r["file"] = tmp_to_orig.get(r["file"], r["file"])
+            return run
 
         t0 = time.time()
-        result = _run_jlink(script, device=device, timeout=timeout)
+        if parallel:
+            logger.info("MRAM via J-Link %s, OSPI via J-Link %s in parallel",
+                        serials[0], serials[1])
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+                runs = list(pool.map(flash_group, [mram_files, ospi_files], serials[:2]))
+        else:
+            runs = [flash_group(load_files, jlink_serial)]
+        result = _merge_jlink_runs(runs)
         elapsed = time.time() - t0
+        in_process = all(r.get("in_process") for r in runs)
 
         if not result["success"]:
             return {
@@ -341,22 +937,16 @@ def flash_images(image_dir: str, components: list[str] | None = None,
                 "elapsed_seconds": round(elapsed, 1),
             }
 
-        # Parse per-file results — map temp .bin names back to originals
-        file_results = _parse_loadbin_output(result["stdout"])
-        tmp_to_orig = {}
-        file_sizes = {}
-        for comp, load_path, orig_path, addr in load_files:
-            orig_name = os.path.basename(orig_path)
-            tmp_to_orig[os.path.basename(load_path)] = orig_name
-            file_sizes[orig_name] = os.path.getsize(orig_path)
+        file_results = result["files"]
+        verified = result["verified"] if verify else None
+
+        file_sizes = {os.path.basename(op): size for _, _, op, _, size in load_files}
         for r in file_results:
-            r["file"] = tmp_to_orig.get(r["file"], r["file"])
             r["size_bytes"] = file_sizes.get(r["file"], 0)
 
         all_ok = all(r["success"] for r in file_results) if file_results else False
-
-        # Check verify results
-        verified = "Verify successful" in result.get("stdout", "") if verify else None
+        _record_flash(manifest, device, load_files, file_results, digests, verified)
+        file_results = skipped + file_results
 
         bps = round(total_bytes / elapsed) if elapsed > 0 else 0
         # Post-flash reset via JLink NSRST
@@ -368,7 +958,7 @@ def flash_images(image_dir: str, components: list[str] | None = None,
 
         result = {
             "success": all_ok,
-            "method": "jlink_loadbin",
+            "method": "jlink_pylink" if in_process else "jlink_loadbin",
             "total_bytes": total_bytes,
             "elapsed_seconds": round(elapsed, 1),
             "bytes_per_second": bps,
@@ -387,12 +977,15 @@ def flash_images(image_dir: str, components: list[str] | None = None,
             result["warnings"] = atoc_warns
         return result
     finally:
-        if tmp_dir is not None:
+        for tmp_dir in tmp_dirs:
             shutil.rmtree(tmp_dir, ignore_errors=True)
 
 
 def flash_from_config(config_path: str, verify: bool = False,
-                      erase: bool = False, device: str | None = None) -> dict:
+                      erase: bool = False, device: str | None = None,
+                      skip_unchanged: bool = False,
+                      config: dict | None = None,
+                      should_cancel: Callable[[], bool] | None = None) -> dict:
     """Flash ATOC + images defined in an ATOC JSON config via J-Link.
 
     Writes AppTocPackage.bin to MRAM (system_mram_base - atoc_size) first,
@@ -402,27 +995,28 @@ def flash_from_config(config_path: str, verify: bool = False,
 
     Reads the same JSON format as the SE-UART flash tool, extracting
     file names and MRAM addresses from each entry. Handles ANY config
-    key with mramAddress + binary fields, not just known keys.
+    key with mramAddress + binary fields, not just known keys. Pass config
+    to reuse an already-parsed copy of config_path.
     """
-    import json
-
     cfg = devices.get_config(device)
     atoc_key_map = cfg["atoc_key_map"]
     system_mram_base = cfg["system_mram_base"]
 
-    with open(config_path) as f:
-        config = json.load(f)
+    if config is None:
+        with open(config_path, "rb") as f:
+            config = jsonio.loads(f.read())
 
     build_dir = os.path.normpath(os.path.join(os.path.dirname(config_path), ".."))
     images_dir = os.path.join(build_dir, "images")
 
     # ATOC — must be written first so SE knows what to boot after reset
     atoc_path = os.path.join(build_dir, "AppTocPackage.bin")
-    if not os.path.exists(atoc_path):
+    try:
+        atoc_size = os.stat(atoc_path).st_size
+    except OSError:
         return {"success": False,
                 "message": f"AppTocPackage.bin not found at {atoc_path} — run gen_toc first"}
 
-    atoc_size = os.path.getsize(atoc_path)
     atoc_addr = system_mram_base - atoc_size
     logger.info("ATOC: %d bytes -> 0x%08X (system_mram_base=0x%08X)",
                 atoc_size, atoc_addr, system_mram_base)
@@ -444,24 +1038,21 @@ def flash_from_config(config_path: str, verify: bool = False,
     custom_layout["atoc"] = {"file": os.path.relpath(atoc_path, images_dir), "addr": atoc_addr}
 
     # Component images from config — process ALL keys generically
-    for key, entry in config.items():
-        if key == "DEVICE" or not isinstance(entry, dict):
-            continue
-        if entry.get("disabled", False):
-            continue
-        binary = entry.get("binary")
-        addr_str = entry.get("address") or entry.get("mramAddress") or entry.get("ospiAddress")
-        if binary and addr_str:
-            addr = int(addr_str, 16)
-            comp = atoc_key_map.get(key, key.lower())
-            custom_layout[comp] = {"file": binary, "addr": addr}
+    custom_layout.update({
+        atoc_key_map.get(key, key.lower()): {"file": binary, "addr": int(addr_str, 16)}
+        for key, entry in config.items()
+        if key != "DEVICE" and isinstance(entry, dict) and not entry.get("disabled", False)
+        and (binary := entry.get("binary"))
+        and (addr_str := entry.get("address") or entry.get("mramAddress") or entry.get("ospiAddress"))
+    })
 
     if len(custom_layout) <= 2:  # only erase + atoc, no actual images
         return {"success": False, "message": "No images found in config"}
 
     components = list(custom_layout.keys())
     result = flash_images(images_dir, components, verify, erase, layout=custom_layout,
-                          device=device)
+                          device=device, skip_unchanged=skip_unchanged,
+                          should_cancel=should_cancel)
 
     # Clean up temp erase file
     if os.path.exists(erase_file):
@@ -0,0 +1,30 @@
+"""JSON encode/decode shared by the flash backends and the MCP server.
+
+Uses orjson when the optional "fast" extra is installed, otherwise the
+standard library. Both accept bytes, so callers can read files in binary
+mode and skip the decode step.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional "fast" extra
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps(obj, indent: bool = False) -> bytes:
+        """Serialize obj to UTF-8 JSON, with 2-space indent if requested."""
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+else:
+    loads = json.loads
+
+    def dumps(obj, indent: bool = False) -> bytes:
+        """Serialize obj to UTF-8 JSON, with 2-space indent if requested."""
+        return json.dumps(obj, indent=2 if indent else None,
+                          ensure_ascii=False).encode()
@@ -13,13 +13,17 @@ Requires:
   - OSPI programmer firmware loaded on M55_HP (via ATOC config)
 """
 
-import json
+import collections
+import contextlib
 import logging
+import mmap
 import os
 import struct
 import time
 import zlib
 
+from . import jsonio
+
 # Monkey-patch pylink 2.0.0 bug: JlinkException vs JLinkException
 # TODO: Remove once pylink-square fixes the typo upstream
 try:
@@ -52,8 +56,12 @@ CMD_HEADER_FMT = "<BBHII"  # cmd_id(B), flags(B), seq(H), addr(I), length(I)
 CMD_HEADER_SIZE = 12
 RESP_HEADER_FMT = "<BBHI"  # resp_id(B), status(B), seq(H), length(I)
 RESP_HEADER_SIZE = 8
+_CMD_HDR = struct.Struct(CMD_HEADER_FMT)
+_RESP_HDR = struct.Struct(RESP_HEADER_FMT)
+_CRC = struct.Struct("<I")
 
 MAX_WRITE_CHUNK = 4096
+PIPELINE_DEPTH = 16  # CMD_WRITEs sent before waiting for the oldest response
 SECTOR_SIZE = 0x10000  # 64KB
 OSPI_XIP_BASE = 0xC0000000
 
@@ -61,6 +69,30 @@ OSPI_XIP_BASE = 0xC0000000
 from . import devices as _devices
 DEVICE = _devices.get_config()["jlink_device"]
 RTT_TIMEOUT = 5.0  # seconds
+# Idle RTT polling: first retry just yields, then backs off up to 1 ms
+_POLL_MIN = 1e-5
+_POLL_MAX = 1e-3
+
+
+def _backoff(delay):
+    """Sleep for delay seconds and return the next, longer poll delay."""
+    time.sleep(delay)
+    return min(delay * 2, _POLL_MAX) if delay else _POLL_MIN
+
+
+def _map_image(path):
+    """Map an image file read-only and start readahead on it.
+
+    program() only ever slices the image, so pages are faulted in as
+    chunks are sent. The mapping is released with its last reference.
+    """
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return b""  # mmap rejects empty files
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_WILLNEED"):
+        mm.madvise(mmap.MADV_WILLNEED)
+    return mm
 
 
 class OspiProgrammerError(Exception):
@@ -89,33 +121,39 @@ class OspiProgrammer:
 
     def _send_cmd(self, cmd_id, addr=0, length=0, data=None):
         """Send a command to the firmware and wait for response."""
-        seq = self._next_seq()
+        seq = self._write_cmd(cmd_id, addr, length, data)
+        return self._read_response(cmd_id, seq)
 
-        # Pack header
-        header = struct.pack(CMD_HEADER_FMT, cmd_id, 0, seq, addr, length)
+    def _write_cmd(self, cmd_id, addr=0, length=0, data=None):
+        """Write one command to the down-buffer. Returns its sequence number."""
+        seq = self._next_seq()
 
-        # Write command
+        # Pack header and payload into one buffer; pylink accepts any
+        # bytes-like object, so partial writes resend a memoryview slice
+        # instead of rebuilding an int list per attempt.
+        payload = bytearray(CMD_HEADER_SIZE + (len(data) if data else 0))
+        _CMD_HDR.pack_into(payload, 0, cmd_id, 0, seq, addr, length)
         if data:
-            payload = header + data
-        else:
-            payload = header
+            payload[CMD_HEADER_SIZE:] = data
+        view = memoryview(payload)
 
         written = 0
+        delay = 0.0
         while written < len(payload):
-            chunk = payload[written:]
-            n = self._jlink.rtt_write(0, list(chunk))
+            n = self._jlink.rtt_write(0, view[written:])
             if n > 0:
                 written += n
+                delay = 0.0
             else:
-                time.sleep(0.001)
-
-        # Read response
-        return self._read_response(cmd_id, seq)
+                # Down-buffer full: give the target time to drain
+                delay = _backoff(delay)
+        return seq
 
     def _read_response(self, expected_cmd_id, expected_seq):
         """Read and parse a response from the firmware."""
         resp_data = b""
         deadline = time.monotonic() + RTT_TIMEOUT
+        delay = 0.0
 
         # Read header
         while len(resp_data) < RESP_HEADER_SIZE:
@@ -125,11 +163,11 @@ class OspiProgrammer:
             chunk = self._jlink.rtt_read(0, RESP_HEADER_SIZE - len(resp_data))
             if chunk:
                 resp_data += bytes(chunk)
+                delay = 0.0
             else:
-                time.sleep(0.001)
+                delay = _backoff(delay)
 
-        resp_id, status, seq, length = struct.unpack(
-            RESP_HEADER_FMT, resp_data[:RESP_HEADER_SIZE])
+        resp_id, status, seq, length = _RESP_HDR.unpack_from(resp_data)
 
         # Validate header
         if resp_id != (expected_cmd_id | RESP_FLAG):
@@ -151,8 +189,9 @@ class OspiProgrammer:
                 chunk = self._jlink.rtt_read(0, length - len(payload))
                 if chunk:
                     payload += bytes(chunk)
+                    delay = 0.0
                 else:
-                    time.sleep(0.001)
+                    delay = _backoff(delay)
 
         if status != STATUS_OK:
             status_names = {
@@ -186,36 +225,50 @@ class OspiProgrammer:
         """
         self._send_cmd(CMD_ERASE, addr=addr, length=length)
 
-    def program(self, addr, data, progress_cb=None):
+    def program(self, addr, data, progress_cb=None, crc=None):
         """Program data to flash.
 
-        Sends data in chunks of up to MAX_WRITE_CHUNK bytes.
+        Sends data in chunks of up to MAX_WRITE_CHUNK bytes, keeping up to
+        PIPELINE_DEPTH writes in flight. The firmware handles commands in
+        order, so responses are collected oldest-first.
 
         Args:
             addr: Flash address (0-based or 0xC0xxxxxx).
             data: Bytes to program.
             progress_cb: Optional callback(bytes_written, total_bytes).
+            crc: Optional starting CRC32. When given, the CRC is updated
+                over each chunk while its write is in flight and the final
+                value is returned.
         """
         total = len(data)
         offset = 0
+        in_flight = collections.deque()  # (seq, end offset)
+
+        while offset < total or in_flight:
+            if offset < total and len(in_flight) < PIPELINE_DEPTH:
+                chunk_size = min(MAX_WRITE_CHUNK, total - offset)
+                chunk = data[offset:offset + chunk_size]
+                seq = self._write_cmd(CMD_WRITE, addr=addr + offset,
+                                      length=chunk_size, data=chunk)
+                offset += chunk_size
+                in_flight.append((seq, offset))
+                if crc is not None:
+                    crc = zlib.crc32(chunk, crc)
+                continue
 
-        while offset < total:
-            chunk_size = min(MAX_WRITE_CHUNK, total - offset)
-            chunk = data[offset:offset + chunk_size]
-
-            self._send_cmd(CMD_WRITE, addr=addr + offset,
-                           length=chunk_size, data=chunk)
-
-            offset += chunk_size
+            seq, acked = in_flight.popleft()
+            self._read_response(CMD_WRITE, seq)
             if progress_cb:
-                progress_cb(offset, total)
+                progress_cb(acked, total)
+
+        return crc
 
     def verify_crc(self, addr, length):
         """Compute CRC32 of flash region. Returns the CRC32 value."""
         payload = self._send_cmd(CMD_VERIFY, addr=addr, length=length)
         if len(payload) < 4:
             raise OspiProgrammerError("Verify response too short")
-        return struct.unpack("<I", payload[:4])[0]
+        return _CRC.unpack_from(payload)[0]
 
     def read(self, addr, length):
         """Read raw flash data. Returns bytes."""
@@ -226,21 +279,20 @@ class OspiProgrammer:
         """Software reset the flash chip."""
         self._send_cmd(CMD_RESET_FLASH)
 
-    def flash_image(self, addr, data, verify=True, progress_cb=None):
+    def flash_image(self, addr, data, verify=True, progress_cb=None, force=False):
         """High-level: erase + program + optional verify for one image.
 
+        Works one flash sector at a time so a bad sector is reported
+        before the rest of the image is erased and written. Unless force
+        is set, a whole sector whose flash CRC already matches the image
+        is left alone (partial sectors are always rewritten so the erase
+        still clears whatever follows the image).
+
         Returns dict with results.
         """
         total = len(data)
         flash_addr = addr
-
-        # Erase
-        logger.info("Erasing %d bytes at 0x%x", total, flash_addr)
-        self.erase(flash_addr, total)
-
-        # Program
-        logger.info("Programming %d bytes at 0x%x", total, flash_addr)
-        self.program(flash_addr, data, progress_cb=progress_cb)
+        view = memoryview(data)
 
         result = {
             "address": f"0x{flash_addr:08x}",
@@ -248,40 +300,76 @@ class OspiProgrammer:
             "status": "ok",
         }
 
-        # Verify
+        logger.info("Erasing + programming %d bytes at 0x%x", total, flash_addr)
+        image_crc = 0
+        skipped = 0
+        offset = 0
+        while offset < total:
+            # Split on sector boundaries so each erase covers exactly the
+            # sector being programmed and never one already written.
+            sector_addr = flash_addr + offset
+            size = min(SECTOR_SIZE - (sector_addr % SECTOR_SIZE), total - offset)
+            chunk = view[offset:offset + size]
+
+            if not force and size == SECTOR_SIZE:
+                expected_crc = zlib.crc32(chunk) & 0xFFFFFFFF
+                if self.verify_crc(sector_addr, size) == expected_crc:
+                    skipped += 1
+                    image_crc = zlib.crc32(chunk, image_crc)
+                    offset += size
+                    if progress_cb:
+                        progress_cb(offset, total)
+                    continue
+
+            self.erase(sector_addr, size)
+            sector_crc = self.program(
+                sector_addr, chunk,
+                progress_cb=progress_cb and (
+                    lambda written, _t, _base=offset: progress_cb(_base + written, total)),
+                crc=0 if verify else None)
+
+            if verify:
+                expected_crc = sector_crc & 0xFFFFFFFF
+                actual_crc = self.verify_crc(sector_addr, size)
+                if actual_crc != expected_crc:
+                    result["status"] = "verify_failed"
+                    result["expected_crc"] = f"0x{expected_crc:08x}"
+                    result["actual_crc"] = f"0x{actual_crc:08x}"
+                    raise OspiProgrammerError(
+                        f"Verify failed at 0x{sector_addr:08x}: "
+                        f"expected CRC 0x{expected_crc:08x}, "
+                        f"got 0x{actual_crc:08x}")
+                image_crc = zlib.crc32(chunk, image_crc)
+            offset += size
+
+        if skipped:
+            logger.info("%d unchanged sector(s) at 0x%x skipped", skipped, flash_addr)
+            result["sectors_skipped"] = skipped
         if verify:
-            logger.info("Verifying %d bytes at 0x%x", total, flash_addr)
-            expected_crc = zlib.crc32(data) & 0xFFFFFFFF
-            actual_crc = self.verify_crc(flash_addr, total)
-            if actual_crc != expected_crc:
-                result["status"] = "verify_failed"
-                result["expected_crc"] = f"0x{expected_crc:08x}"
-                result["actual_crc"] = f"0x{actual_crc:08x}"
-                raise OspiProgrammerError(
-                    f"Verify failed at 0x{flash_addr:08x}: "
-                    f"expected CRC 0x{expected_crc:08x}, "
-                    f"got 0x{actual_crc:08x}")
-            result["crc32"] = f"0x{actual_crc:08x}"
+            # Every sector matched, so the flash CRC equals the image CRC
+            result["crc32"] = f"0x{image_crc & 0xFFFFFFFF:08x}"
             result["verified"] = True
 
         return result
 
-    def flash_images(self, config_path, verify=True):
+    def flash_images(self, config_path, verify=True, force=False):
         """Flash all enabled images from an ATOC-style JSON config.
 
         Processes entries with 'address' or 'ospiAddress' fields
-        (OSPI images only — MRAM images are skipped).
+        (OSPI images only — MRAM images are skipped). force rewrites
+        sectors that already hold the image (see flash_image).
 
         Returns dict with per-image results.
         """
-        with open(config_path) as f:
-            config = json.load(f)
+        with open(config_path, "rb") as f:
+            config = jsonio.loads(f.read())
 
         config_dir = os.path.dirname(os.path.abspath(config_path))
         results = {}
         total_bytes = 0
         start_time = time.monotonic()
 
+        jobs = []  # (name, binary, bin_path or None, addr)
         for name, entry in config.items():
             if not isinstance(entry, dict):
                 continue
@@ -304,12 +392,25 @@ class OspiProgrammer:
             # Resolve binary path
             bin_path = binary if os.path.isabs(binary) else \
                 os.path.join(config_dir, binary)
-            if not os.path.exists(bin_path):
+            jobs.append((name, binary,
+                         bin_path if os.path.exists(bin_path) else None, addr))
+
+        # Map one image ahead so the kernel reads it in while the current
+        # one is programming; RTT I/O itself stays on this thread.
+        mapped = [i for i, job in enumerate(jobs) if job[2]]
+        upcoming = {}
+        if mapped:
+            upcoming[mapped[0]] = _map_image(jobs[mapped[0]][2])
+
+        for i, (name, binary, bin_path, addr) in enumerate(jobs):
+            if bin_path is None:
                 results[name] = {"status": "file_not_found", "binary": binary}
                 continue
 
-            with open(bin_path, "rb") as f:
-                data = f.read()
+            data = upcoming.pop(i)
+            nxt = next((j for j in mapped if j > i), None)
+            if nxt is not None:
+                upcoming[nxt] = _map_image(jobs[nxt][2])
 
             logger.info("Flashing %s: %s (%d bytes) -> 0x%x",
                         name, binary, len(data), addr)
@@ -319,7 +420,7 @@ class OspiProgrammer:
                 logger.info("%s: %d/%d bytes (%d%%)", _name, written, total, pct)
 
             result = self.flash_image(addr, data, verify=verify,
-                                      progress_cb=progress)
+                                      progress_cb=progress, force=force)
             result["binary"] = binary
             results[name] = result
             total_bytes += len(data)
@@ -335,10 +436,12 @@ class OspiProgrammer:
         }
 
 
-def connect_and_program(config_path, verify=True, device=None):
-    """Convenience: connect JLink, start RTT, program, close.
+@contextlib.contextmanager
+def rtt_session(device=None):
+    """Connect the first J-Link to the device's M55_HP core and start RTT.
 
-    Returns results dict.
+    Yields the connected pylink.JLink. RTT is stopped and the probe
+    closed on exit, however the block ends.
     """
     import pylink
 
@@ -346,19 +449,19 @@ def connect_and_program(config_path, verify=True, device=None):
     jlink_device = cfg["jlink_device"]
 
     jlink = pylink.JLink()
+    # Find emulator explicitly — jlink.open() with no args can fail
+    # in subprocess contexts (e.g., MCP server)
+    emulators = jlink.connected_emulators()
+    if not emulators:
+        raise OspiProgrammerError("No J-Link emulators found")
+    try:
+        jlink.open(serial_no=emulators[0].SerialNumber)
+    except AttributeError:
+        # pylink-square 2.0.0 has a typo: JlinkException vs JLinkException
+        raise OspiProgrammerError(
+            f"J-Link open failed (found {len(emulators)} emulator(s), "
+            f"serial={emulators[0].SerialNumber})")
     try:
-        # Find emulator explicitly — jlink.open() with no args can fail
-        # in subprocess contexts (e.g., MCP server)
-        emulators = jlink.connected_emulators()
-        if not emulators:
-            raise OspiProgrammerError("No J-Link emulators found")
-        try:
-            jlink.open(serial_no=emulators[0].SerialNumber)
-        except AttributeError:
-            # pylink-square 2.0.0 has a typo: JlinkException vs JLinkException
-            raise OspiProgrammerError(
-                f"J-Link open failed (found {len(emulators)} emulator(s), "
-                f"serial={emulators[0].SerialNumber})")
         jlink.connect(jlink_device, verbose=True)
         jlink.rtt_start()
 
@@ -371,6 +474,21 @@ def connect_and_program(config_path, verify=True, device=None):
             except Exception:
                 time.sleep(0.1)
 
+        yield jlink
+    finally:
+        try:
+            jlink.rtt_stop()
+        except Exception:
+            pass
+        jlink.close()
+
+
+def connect_and_program(config_path, verify=True, device=None):
+    """Convenience: connect JLink, start RTT, program, close.
+
+    Returns results dict.
+    """
+    with rtt_session(device) as jlink:
         programmer = OspiProgrammer(jlink)
 
         # Verify firmware is alive
@@ -388,10 +506,3 @@ def connect_and_program(config_path, verify=True, device=None):
         results["firmware_version"] = version
         results["flash_id"] = f"0x{flash_id:02x}"
         return results
-
-    finally:
-        try:
-            jlink.rtt_stop()
-        except Exception:
-            pass
-        jlink.close()
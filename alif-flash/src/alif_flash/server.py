@@ -1,13 +1,21 @@
 """MCP server for Alif Ensemble flash — SE-UART ISP and J-Link (MRAM + OSPI)."""
 
-import json
+import asyncio
+import concurrent.futures
+import functools
 import logging
 import os
+import threading
+import time
 import traceback
 
 from mcp.server import Server
 from mcp.types import TextContent, Tool
 
+# Imported once here rather than per tool call. ospi_rtt stays lazy: it
+# pulls in pylink and is only used by the (broken) RTT programmer.
+from . import isp, jlink, jsonio, xmodem
+
 logger = logging.getLogger(__name__)
 
 _DEVICE_PROPERTY = {
@@ -16,7 +24,19 @@ _DEVICE_PROPERTY = {
     "default": "alif-e7",
 }
 
-TOOLS = [
+_PORT_PROPERTY = {
+    "type": "string",
+    "description": "Serial port path. Auto-detected if omitted.",
+}
+
+_POWER_CYCLE_TIMEOUT_PROPERTY = {
+    "type": "number",
+    "description": "Seconds to poll for SE response when wait_for_power_cycle=true (default: 15)",
+    "default": 15,
+}
+
+# Built once at import; a tuple so handlers can't mutate the shared set
+TOOLS = (
     Tool(
         name="list_ports",
         description="List available SE-UART serial ports (/dev/cu.usbmodem*).",
@@ -33,10 +53,7 @@ TOOLS = [
         inputSchema={
             "type": "object",
             "properties": {
-                "port": {
-                    "type": "string",
-                    "description": "Serial port path. Auto-detected if omitted.",
-                },
+                "port": _PORT_PROPERTY,
                 "device": _DEVICE_PROPERTY,
             },
         },
@@ -53,10 +70,7 @@ TOOLS = [
         inputSchema={
             "type": "object",
             "properties": {
-                "port": {
-                    "type": "string",
-                    "description": "Serial port path. Auto-detected if omitted.",
-                },
+                "port": _PORT_PROPERTY,
                 "jlink_reset": {
                     "type": "boolean",
                     "description": "Reset board via JLink before entering maintenance (no manual power cycle needed)",
@@ -75,11 +89,7 @@ TOOLS = [
                     ),
                     "default": False,
                 },
-                "power_cycle_timeout": {
-                    "type": "number",
-                    "description": "Seconds to poll for SE response when wait_for_power_cycle=true (default: 15)",
-                    "default": 15,
-                },
+                "power_cycle_timeout": _POWER_CYCLE_TIMEOUT_PROPERTY,
                 "device": _DEVICE_PROPERTY,
             },
         },
@@ -115,10 +125,7 @@ TOOLS = [
                     "type": "string",
                     "description": "Absolute path to ATOC JSON config, or relative to setools_dir/build/config/",
                 },
-                "port": {
-                    "type": "string",
-                    "description": "Serial port path. Auto-detected if omitted.",
-                },
+                "port": _PORT_PROPERTY,
                 "maintenance": {
                     "type": "boolean",
                     "description": "Enter maintenance mode first (default: false)",
@@ -142,11 +149,7 @@ TOOLS = [
                     ),
                     "default": False,
                 },
-                "power_cycle_timeout": {
-                    "type": "number",
-                    "description": "Seconds to poll for SE response when wait_for_power_cycle=true (default: 15)",
-                    "default": 15,
-                },
+                "power_cycle_timeout": _POWER_CYCLE_TIMEOUT_PROPERTY,
                 "device": _DEVICE_PROPERTY,
             },
             "required": ["config"],
@@ -181,6 +184,11 @@ TOOLS = [
                     "description": "Pre-erase OSPI region before programming. Clears stale data that kernel MTD partition parsers might misinterpret. Only affects OSPI addresses. (default: false)",
                     "default": False,
                 },
+                "skip_unchanged": {
+                    "type": "boolean",
+                    "description": "Skip images identical (size + SHA-256) to what the last jlink_flash wrote at the same address. Don't use after flashing those addresses another way (e.g. SE-UART). (default: false)",
+                    "default": False,
+                },
                 "device": _DEVICE_PROPERTY,
             },
         },
@@ -262,10 +270,7 @@ TOOLS = [
         inputSchema={
             "type": "object",
             "properties": {
-                "port": {
-                    "type": "string",
-                    "description": "Serial port path. Auto-detected if omitted.",
-                },
+                "port": _PORT_PROPERTY,
                 "baud": {
                     "type": "integer",
                     "description": "Baud rate (default: 115200)",
@@ -290,29 +295,110 @@ TOOLS = [
             },
         },
     ),
-]
+)
 
 
 def _text(content: str) -> list[TextContent]:
     return [TextContent(type="text", text=content)]
 
 
+# Free-text result fields (tool logs) that can grow to megabytes.
+_LOG_FIELDS = ("log", "stdout", "output", "raw_output")
+_LOG_CHUNK = 64 * 1024
+
+# Results up to this size are pretty-printed; larger ones stay compact,
+# where indentation only adds bytes for the client to skip.
+_PRETTY_MAX = 8192
+
+
+def _dumps(data) -> str:
+    # Large results are large because of their text fields (tool logs), so
+    # size those up instead of serializing once just to measure.
+    large = isinstance(data, dict) and sum(
+        len(v) for v in data.values() if isinstance(v, str)) > _PRETTY_MAX
+    return jsonio.dumps(data, indent=not large).decode()
+
+
 def _json(data) -> list[TextContent]:
-    return [TextContent(type="text", text=json.dumps(data, indent=2))]
+    """Serialize a tool result.
+
+    Log fields over _LOG_CHUNK are moved out of the JSON document and sent
+    as follow-up text blocks of at most _LOG_CHUNK characters each, so the
+    encoder never has to build one string holding the whole log. The JSON
+    block records how many blocks each field was split into.
+    """
+    if not isinstance(data, dict):
+        return [TextContent(type="text", text=_dumps(data))]
+    big = [k for k in _LOG_FIELDS
+           if isinstance(data.get(k), str) and len(data[k]) > _LOG_CHUNK]
+    if not big:
+        return [TextContent(type="text", text=_dumps(data))]
+    meta = {k: v for k, v in data.items() if k not in big}
+    meta["chunked"] = {k: -(-len(data[k]) // _LOG_CHUNK) for k in big}
+    out = [TextContent(type="text", text=_dumps(meta))]
+    for k in big:
+        text = data[k]
+        out.extend(TextContent(type="text", text=text[i:i + _LOG_CHUNK])
+                   for i in range(0, len(text), _LOG_CHUNK))
+    return out
+
+
+# Auto-detected SE-UART ports, reused for back-to-back tool calls
+# (probe -> maintenance -> flash). Cleared whenever a tool fails.
+_PORT_CACHE_TTL = 2.0
+_port_cache = {"ts": 0.0, "ports": []}
+
+
+def _find_ports(refresh: bool = False) -> list[str]:
+    """isp.find_se_uart(), cached for _PORT_CACHE_TTL seconds."""
+    now = time.monotonic()
+    if refresh or not _port_cache["ports"] or now - _port_cache["ts"] >= _PORT_CACHE_TTL:
+        _port_cache["ports"] = isp.find_se_uart()
+        _port_cache["ts"] = now
+    return _port_cache["ports"]
+
+
+def _resolve_config(path: str, setools_dir: str | None) -> str:
+    """Resolve a relative config path against setools_dir (if configured)."""
+    if setools_dir and not os.path.isabs(path):
+        return os.path.join(setools_dir, path)
+    return path
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_config(path: str, mtime_ns: int, size: int) -> dict:
+    with open(path, "rb") as f:
+        return jsonio.loads(f.read())
+
+
+def _load_config(path: str) -> dict:
+    """Parsed ATOC config, reused until the file changes.
+
+    flash followed by jlink_flash on the same config parses it once. The
+    returned dict is shared; callers must not modify it.
+    """
+    st = os.stat(path)
+    return _parse_config(path, st.st_mtime_ns, st.st_size)
 
 
 def _resolve_port(args: dict) -> str:
     """Resolve serial port from args or auto-detect.
 
     Prefers usbserial (FTDI) over usbmodem (JLink VCOM) since the
-    SE-UART ISP protocol runs on the FTDI adapter.
+    SE-UART ISP protocol runs on the FTDI adapter. ALIF_PORT pins the
+    port without enumerating /dev; ALIF_USB_SERIAL narrows enumeration to
+    ports whose name contains that USB serial number.
     """
-    from . import isp
-
     port = args.get("port")
     if port:
         return port
-    ports = isp.find_se_uart()
+    env_port = os.environ.get("ALIF_PORT")
+    if env_port and os.path.exists(env_port):
+        return env_port
+    ports = _find_ports()
+    usb_serial = os.environ.get("ALIF_USB_SERIAL")
+    if usb_serial:
+        ports = [p for p in ports if usb_serial in p]
     if not ports:
         raise RuntimeError("No SE-UART ports found. Is PRG_USB connected?")
     # Prefer FTDI (usbserial) over JLink VCOM (usbmodem)
@@ -323,36 +409,19 @@ def _resolve_port(args: dict) -> str:
 def _ospi_program_single(data: bytes, addr: int, verify: bool,
                          device: str | None = None) -> dict:
     """Program a single image via RTT."""
-    from . import devices
-    import pylink
-    import time
-
-    cfg = devices.get_config(device)
-    jlink = pylink.JLink()
-    try:
-        jlink.open()
-        jlink.connect(cfg["jlink_device"], verbose=True)
-        jlink.rtt_start()
-        time.sleep(0.5)  # Wait for RTT control block
+    from . import ospi_rtt
 
-        from . import ospi_rtt
+    with ospi_rtt.rtt_session(device) as jlink:
         programmer = ospi_rtt.OspiProgrammer(jlink)
         version = programmer.ping()
         result = programmer.flash_image(addr, data, verify=verify)
         result["firmware_version"] = version
         return result
-    finally:
-        try:
-            jlink.rtt_stop()
-        except Exception:
-            pass
-        jlink.close()
 
 
 def _ospi_program_usb(image: str, device: str,
                       timeout_override: float | None = None) -> dict:
     """Run XMODEM transfer over USB CDC-ACM. Called from thread."""
-    from . import xmodem
     import serial as _serial
 
     port = _serial.Serial(device, 115200, timeout=1)
@@ -364,167 +433,220 @@ def _ospi_program_usb(image: str, device: str,
         port.close()
 
 
+# Tool work is blocking serial/J-Link I/O; two workers are enough and keep
+# it off the loop's default executor (sized for CPU count).
+_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix="alif-flash")
+
+
+async def _in_worker(fn, /, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_workers() -> None:
+    """Stop the tool worker threads and drop cached images (call once the server has exited)."""
+    _executor.shutdown(wait=False, cancel_futures=True)
+    isp.clear_image_cache()
+
+
 def create_server(setools_dir: str | None = None) -> Server:
     server = Server("alif-flash")
     _setools_dir = setools_dir
 
     @server.list_tools()
     async def list_tools() -> list[Tool]:
-        return TOOLS
+        return list(TOOLS)
 
     @server.call_tool()
     async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         try:
             return await _dispatch(name, arguments, _setools_dir)
         except Exception as e:
+            _port_cache["ports"] = []  # the port may have gone away; rescan next time
             logger.exception("Tool %s failed", name)
-            return _text(f"Error: {e}\n\n{traceback.format_exc()}")
+            if os.environ.get("ALIF_FLASH_DEBUG"):
+                return _text(f"Error: {e}\n\n{traceback.format_exc()}")
+            return _text(f"Error: {e}")
 
     return server
 
 
-async def _dispatch(name: str, args: dict, setools_dir: str | None) -> list[TextContent]:
-    import asyncio
-    from . import isp
-
+async def _list_ports(args: dict, setools_dir: str | None) -> list[TextContent]:
+    ports = tuple(_find_ports(refresh=True))
+    # The port set rarely changes between calls; reuse the serialized reply.
+    if _port_cache.get("listed") != ports:
+        _port_cache["listed"] = ports
+        _port_cache["listed_json"] = _dumps({"ports": list(ports), "count": len(ports)})
+    return _text(_port_cache["listed_json"])
+
+
+async def _probe(args: dict, setools_dir: str | None) -> list[TextContent]:
+    port = _resolve_port(args)
+    result = await _in_worker(isp.probe, port)
+    return _json(result)
+
+
+async def _maintenance(args: dict, setools_dir: str | None) -> list[TextContent]:
+    port = _resolve_port(args)
+    jlink_reset = args.get("jlink_reset", False)
+    wait_replug = args.get("wait_for_replug", False)
+    wait_power_cycle = args.get("wait_for_power_cycle", False)
+    power_cycle_timeout = float(args.get("power_cycle_timeout", 15))
+    result = await _in_worker(
+        isp.enter_maintenance, port,
+        do_wait_for_replug=wait_replug, jlink_reset=jlink_reset,
+        wait_for_power_cycle=wait_power_cycle,
+        power_cycle_timeout=power_cycle_timeout,
+    )
+    return _json(result)
+
+
+async def _gen_toc(args: dict, setools_dir: str | None) -> list[TextContent]:
+    if not setools_dir:
+        return _text("Error: --setools-dir not configured")
+    config_rel = args["config"]
+    result = await _in_worker(
+        isp.gen_toc, setools_dir, config_rel, device=args.get("device"))
+    return _json(result)
+
+
+async def _flash(args: dict, setools_dir: str | None) -> list[TextContent]:
+    port = _resolve_port(args)
+    config_path = _resolve_config(args["config"], setools_dir)
+    enter_maint = args.get("maintenance", False)
+    jlink_reset = args.get("jlink_reset", False)
+    wait_replug = args.get("wait_for_replug", False)
+    wait_power_cycle = args.get("wait_for_power_cycle", False)
+    power_cycle_timeout = float(args.get("power_cycle_timeout", 15))
+    parsed = await _in_worker(_load_config, config_path)
+    result = await _in_worker(
+        isp.flash_images, port, config_path, enter_maint,
+        do_wait_for_replug=wait_replug, jlink_reset=jlink_reset,
+        wait_for_power_cycle=wait_power_cycle,
+        power_cycle_timeout=power_cycle_timeout,
+        device=args.get("device"), config=parsed,
+    )
+    return _json(result)
+
+
+async def _jlink_flash(args: dict, setools_dir: str | None) -> list[TextContent]:
     device = args.get("device")
+    config = args.get("config")
+    verify = args.get("verify", False)
+    erase = args.get("erase", False)
+    skip_unchanged = args.get("skip_unchanged", False)
+    # Set when the tool call is cancelled so the worker kills JLinkExe
+    # instead of flashing on after the client has gone away.
+    cancel = threading.Event()
+    try:
+        if config:
+            config = _resolve_config(config, setools_dir)
+            parsed = await _in_worker(_load_config, config)
+            result = await _in_worker(
+                jlink.flash_from_config, config, verify, erase,
+                device=device, skip_unchanged=skip_unchanged, config=parsed,
+                should_cancel=cancel.is_set)
+        else:
+            image_dir = args.get("image_dir", "")
+            if not image_dir:
+                return _text("Error: provide either 'image_dir' or 'config'")
+            components = args.get("components")
+            result = await _in_worker(
+                jlink.flash_images, image_dir, components, verify, erase,
+                device=device, skip_unchanged=skip_unchanged,
+                should_cancel=cancel.is_set)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
+    return _json(result)
+
+
+async def _jlink_setup(args: dict, setools_dir: str | None) -> list[TextContent]:
+    device = args.get("device")
+    if args.get("install", False):
+        result = await _in_worker(
+            jlink.install_device_def, device=device)
+    else:
+        result = jlink.check_setup(device=device)
+    return _json(result)
 
-    match name:
-        case "list_ports":
-            ports = isp.find_se_uart()
-            return _json({"ports": ports, "count": len(ports)})
-
-        case "probe":
-            port = _resolve_port(args)
-            result = await asyncio.to_thread(isp.probe, port)
-            return _json(result)
-
-        case "maintenance":
-            port = _resolve_port(args)
-            jlink_reset = args.get("jlink_reset", False)
-            wait_replug = args.get("wait_for_replug", False)
-            wait_power_cycle = args.get("wait_for_power_cycle", False)
-            power_cycle_timeout = float(args.get("power_cycle_timeout", 15))
-            result = await asyncio.to_thread(
-                isp.enter_maintenance, port,
-                do_wait_for_replug=wait_replug, jlink_reset=jlink_reset,
-                wait_for_power_cycle=wait_power_cycle,
-                power_cycle_timeout=power_cycle_timeout,
-            )
-            return _json(result)
-
-        case "gen_toc":
-            if not setools_dir:
-                return _text("Error: --setools-dir not configured")
-            config_rel = args["config"]
-            result = await asyncio.to_thread(
-                isp.gen_toc, setools_dir, config_rel, device=device)
-            return _json(result)
-
-        case "flash":
-            port = _resolve_port(args)
-            config_path = args["config"]
-            # Resolve relative config paths against setools_dir
-            if not os.path.isabs(config_path) and setools_dir:
-                config_path = os.path.join(setools_dir, config_path)
-            enter_maint = args.get("maintenance", False)
-            jlink_reset = args.get("jlink_reset", False)
-            wait_replug = args.get("wait_for_replug", False)
-            wait_power_cycle = args.get("wait_for_power_cycle", False)
-            power_cycle_timeout = float(args.get("power_cycle_timeout", 15))
-            result = await asyncio.to_thread(
-                isp.flash_images, port, config_path, enter_maint,
-                do_wait_for_replug=wait_replug, jlink_reset=jlink_reset,
-                wait_for_power_cycle=wait_power_cycle,
-                power_cycle_timeout=power_cycle_timeout,
-                device=device
-            )
-            return _json(result)
-
-        case "jlink_flash":
-            from . import jlink
-            config = args.get("config")
-            verify = args.get("verify", False)
-            erase = args.get("erase", False)
-            if config:
-                if not os.path.isabs(config) and setools_dir:
-                    config = os.path.join(setools_dir, config)
-                result = await asyncio.to_thread(
-                    jlink.flash_from_config, config, verify, erase,
-                    device=device)
-            else:
-                image_dir = args.get("image_dir", "")
-                if not image_dir:
-                    return _text("Error: provide either 'image_dir' or 'config'")
-                components = args.get("components")
-                result = await asyncio.to_thread(
-                    jlink.flash_images, image_dir, components, verify, erase,
-                    device=device)
-            return _json(result)
-
-        case "jlink_setup":
-            from . import jlink
-            if args.get("install", False):
-                result = await asyncio.to_thread(
-                    jlink.install_device_def, device=device)
-            else:
-                result = jlink.check_setup(device=device)
-            return _json(result)
-
-        case "ospi_program":
-            from . import ospi_rtt
-            config = args.get("config")
-            image = args.get("image")
-            address = args.get("address")
-            verify = args.get("verify", True)
-            if config:
-                if not os.path.isabs(config) and setools_dir:
-                    config = os.path.join(setools_dir, config)
-                result = await asyncio.to_thread(
-                    ospi_rtt.connect_and_program, config, verify,
-                    device=device)
-            elif image and address:
-                addr = int(address, 16) if isinstance(address, str) else address
-                with open(image, "rb") as f:
-                    data = f.read()
-                result = await asyncio.to_thread(
-                    _ospi_program_single, data, addr, verify,
-                    device=device)
-            else:
-                return _text("Error: provide 'config' or both 'image' and 'address'")
-            return _json(result)
-
-        case "ospi_program_usb":
-            from . import xmodem
-            image = args.get("image", "")
-            if not image:
-                return _text("Error: 'image' parameter is required")
-            if not os.path.isfile(image):
-                return _text(f"Error: file not found: {image}")
-            usb_device = args.get("device", "")
-            if not usb_device:
-                usb_device = xmodem.find_cdc_device()
-                if not usb_device:
-                    return _text(
-                        "Error: No Alif CDC-ACM device found — "
-                        "is programming mode ATOC flashed and J2 connected?"
-                    )
-            timeout_override = args.get("timeout")
-            result = await asyncio.to_thread(
-                _ospi_program_usb, image, usb_device, timeout_override)
-            return _json(result)
-
-        case "monitor":
-            port = _resolve_port(args)
-            baud = args.get("baud", 115200)
-            duration = args.get("duration", 15)
-            wait_replug = args.get("wait_for_replug", False)
-            jlink_reset = args.get("jlink_reset", False)
-            result = await asyncio.to_thread(
-                isp.monitor, port, baud, duration, wait_replug,
-                jlink_reset,
+
+async def _ospi_program(args: dict, setools_dir: str | None) -> list[TextContent]:
+    from . import ospi_rtt
+    device = args.get("device")
+    config = args.get("config")
+    image = args.get("image")
+    address = args.get("address")
+    verify = args.get("verify", True)
+    if config:
+        config = _resolve_config(config, setools_dir)
+        result = await _in_worker(
+            ospi_rtt.connect_and_program, config, verify,
+            device=device)
+    elif image and address:
+        addr = int(address, 16) if isinstance(address, str) else address
+        with open(image, "rb") as f:
+            data = f.read()
+        result = await _in_worker(
+            _ospi_program_single, data, addr, verify,
+            device=device)
+    else:
+        return _text("Error: provide 'config' or both 'image' and 'address'")
+    return _json(result)
+
+
+async def _ospi_program_usb_tool(args: dict, setools_dir: str | None) -> list[TextContent]:
+    image = args.get("image", "")
+    if not image:
+        return _text("Error: 'image' parameter is required")
+    if not os.path.isfile(image):
+        return _text(f"Error: file not found: {image}")
+    usb_device = args.get("device", "")
+    if not usb_device:
+        usb_device = xmodem.find_cdc_device()
+        if not usb_device:
+            return _text(
+                "Error: No Alif CDC-ACM device found — "
+                "is programming mode ATOC flashed and J2 connected?"
             )
-            return _json(result)
+    timeout_override = args.get("timeout")
+    result = await _in_worker(
+        _ospi_program_usb, image, usb_device, timeout_override)
+    return _json(result)
+
+
+async def _monitor(args: dict, setools_dir: str | None) -> list[TextContent]:
+    port = _resolve_port(args)
+    baud = args.get("baud", 115200)
+    duration = args.get("duration", 15)
+    wait_replug = args.get("wait_for_replug", False)
+    jlink_reset = args.get("jlink_reset", False)
+    result = await _in_worker(
+        isp.monitor, port, baud, duration, wait_replug,
+        jlink_reset,
+    )
+    return _json(result)
+
+
+# Tool name -> handler; looked up once per call instead of walking a match.
+_HANDLERS = {
+    "list_ports": _list_ports,
+    "probe": _probe,
+    "maintenance": _maintenance,
+    "gen_toc": _gen_toc,
+    "flash": _flash,
+    "jlink_flash": _jlink_flash,
+    "jlink_setup": _jlink_setup,
+    "ospi_program": _ospi_program,
+    "ospi_program_usb": _ospi_program_usb_tool,
+    "monitor": _monitor,
+}
+
 
-        case _:
-            return _text(f"Unknown tool: {name}")
+async def _dispatch(name: str, args: dict, setools_dir: str | None) -> list[TextContent]:
+    handler = _HANDLERS.get(name)
+    if handler is None:
+        return _text(f"Unknown tool: {name}")
+    return await handler(args, setools_dir)
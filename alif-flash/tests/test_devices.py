@@ -2,7 +2,7 @@
 
 import pytest
 
-from alif_flash.devices import DEVICES, DEFAULT_DEVICE, get_config, list_devices
+from alif_flash.devices import DEVICES, DEFAULT_DEVICE, as_dict, get_config, list_devices
 
 
 class TestDeviceRegistry:
@@ -100,6 +100,21 @@ class TestGetConfig:
             get_config("bogus-board")
 
 
+    def test_config_is_read_only(self):
+        cfg = get_config("alif-e7")
+        with pytest.raises(TypeError):
+            cfg["isp_baud"] = 115200
+        with pytest.raises(TypeError):
+            cfg["mram_layout"]["tfa"]["addr"] = 0
+
+    def test_as_dict_returns_plain_copy(self):
+        gcfg = as_dict(get_config("alif-e7")["global_cfg"])
+        assert type(gcfg) is dict
+        assert type(gcfg["DEVICE"]) is dict
+        gcfg["DEVICE"]["Revision"] = "XX"
+        assert get_config("alif-e7")["global_cfg"]["DEVICE"]["Revision"] == "B4"
+
+
 class TestListDevices:
     def test_returns_list(self):
         result = list_devices()
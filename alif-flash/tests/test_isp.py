@@ -2,13 +2,27 @@
 
 import json
 import os
+import struct
 import tempfile
+import time
 from unittest.mock import patch
 
 from alif_flash.isp import (
+    _fill_download_frame,
+    _load_image,
+    _lower_latency_timer,
+    _new_download_frame,
+    _write_segment,
     calc_checksum,
+    clear_image_cache,
+    find_se_uart,
+    flash_images,
     make_packet,
+    monitor,
     read_response,
+    send_cmd,
+    wait_for_replug,
+    write_image,
     CMD_START_ISP,
     CMD_STOP_ISP,
     CMD_DOWNLOAD_DATA,
@@ -45,6 +59,19 @@ class TestChecksum:
         cksum = calc_checksum(data)
         assert (sum(data) + cksum) & 0xFF == 0
 
+    def test_buffer_types(self):
+        """bytearray and memoryview slices checksum the same as bytes."""
+        data = bytes(range(256)) * 2
+        expected = calc_checksum(data[3:243])
+        assert calc_checksum(bytearray(data)[3:243]) == expected
+        assert calc_checksum(memoryview(data)[3:243]) == expected
+
+    def test_partial_sum(self):
+        """A precomputed header sum matches checksumming header + payload."""
+        header = b'\xF5\x04'
+        payload = bytes(range(243))
+        assert calc_checksum(payload, sum(header)) == calc_checksum(header + payload)
+
 
 class TestMakePacket:
     def test_start_isp(self):
@@ -102,6 +129,18 @@ class TestMakePacket:
         assert (sum(pkt)) & 0xFF == 0
 
 
+class TestDownloadFrame:
+    def test_matches_make_packet(self):
+        """In-place framing equals make_packet for full and short chunks."""
+        buf = _new_download_frame()
+        for seq, size in ((0, DATA_PER_CHUNK), (0x1FF, DATA_PER_CHUNK),
+                          (7, 16), (8, DATA_PER_CHUNK), (9, 1)):
+            chunk = bytes((seq + i) & 0xFF for i in range(size))
+            n = _fill_download_frame(buf, seq, chunk)
+            assert bytes(buf[:n]) == make_packet(
+                CMD_DOWNLOAD_DATA, struct.pack('<H', seq) + chunk)
+
+
 class FakeSerial:
     """Minimal serial mock for read_response tests."""
 
@@ -109,8 +148,10 @@ class FakeSerial:
         self._data = data
         self._pos = 0
         self.timeout = 2
+        self.reads = 0
 
     def read(self, n: int) -> bytes:
+        self.reads += 1
         chunk = self._data[self._pos:self._pos + n]
         self._pos += n
         return chunk
@@ -125,6 +166,15 @@ class TestReadResponse:
         assert cmd == CMD_ACK
         assert data == b''
 
+    def test_ack_single_read(self):
+        """An ACK is consumed with one read call."""
+        ser = FakeSerial(make_packet(CMD_ACK) + make_packet(CMD_ACK))
+        cmd, _ = read_response(ser)
+        assert cmd == CMD_ACK
+        assert ser.reads == 1
+        # The following packet is left untouched
+        assert read_response(ser) == (CMD_ACK, b'')
+
     def test_data_response(self):
         # DATA_RESP with 4 bytes of data
         payload = b'\x01\x02\x03\x04'
@@ -156,6 +206,360 @@ class TestReadResponse:
         assert data[9] == 0  # not in maintenance
 
 
+class AckSerial:
+    """Serial mock that records writes and answers each packet with ACK."""
+
+    def __init__(self):
+        self.written = []  # individual packets, split on the length byte
+        self.writes = 0    # write() calls
+        self._rx = b''
+        self.timeout = 2
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._rx)
+
+    def write(self, data) -> int:
+        self.writes += 1
+        data = bytes(data)
+        pos = 0
+        while pos < len(data):
+            self.written.append(data[pos:pos + data[pos]])
+            self._rx += make_packet(CMD_ACK)
+            pos += data[pos]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def read(self, n: int) -> bytes:
+        chunk, self._rx = self._rx[:n], self._rx[n:]
+        return chunk
+
+
+class TestSendCmd:
+    @patch("alif_flash.isp.time.sleep")
+    def test_no_fixed_delay(self, mock_sleep):
+        """send_cmd waits on the response read, not a fixed sleep."""
+        ser = AckSerial()
+        ok, data = send_cmd(ser, CMD_ENQUIRY, label="ENQUIRY", quiet=True)
+        assert ok
+        assert data == b''
+        assert ser.written == [make_packet(CMD_ENQUIRY)]
+        mock_sleep.assert_not_called()
+
+    def test_drains_after_bad_response(self):
+        """Trailing garbage after an unparseable reply is discarded."""
+        ser = AckSerial()
+        ser.write = lambda data: len(data)
+        ser._rx = b'\x01garbage'
+        ok, _ = send_cmd(ser, CMD_ENQUIRY, quiet=True)
+        assert not ok
+        assert ser.in_waiting == 0
+
+
+class TestFindSeUart:
+    def test_single_scan_filters_by_prefix(self, tmp_path):
+        for name in ("cu.usbserial-1", "cu.usbmodem12001", "tty.usbserial-1", "null"):
+            (tmp_path / name).touch()
+        with patch("alif_flash.isp._DEV_DIR", str(tmp_path)):
+            assert find_se_uart() == [
+                str(tmp_path / "cu.usbmodem12001"),
+                str(tmp_path / "cu.usbserial-1"),
+            ]
+
+    def test_missing_dev_dir(self, tmp_path):
+        with patch("alif_flash.isp._DEV_DIR", str(tmp_path / "nope")):
+            assert find_se_uart() == []
+
+
+class TestLatencyTimer:
+    def test_sets_timer_to_1ms(self, tmp_path):
+        attr = tmp_path / "ttyUSB0" / "latency_timer"
+        attr.parent.mkdir()
+        attr.write_text("16\n")
+        with patch("alif_flash.isp._LATENCY_TIMER", str(tmp_path / "{}" / "latency_timer")):
+            _lower_latency_timer("/dev/ttyUSB0")
+        assert attr.read_text().strip() == "1"
+
+    def test_missing_attribute_ignored(self, tmp_path):
+        with patch("alif_flash.isp._LATENCY_TIMER", str(tmp_path / "{}" / "latency_timer")):
+            _lower_latency_timer("/dev/ttyACM0")  # not an FTDI port: no error
+
+
+class TestWaitForReplug:
+    @patch("alif_flash.isp.time.sleep")
+    @patch("alif_flash.isp._DevWatch.wait")
+    @patch("alif_flash.isp.find_se_uart")
+    def test_waits_for_unplug_then_replug(self, mock_find, mock_wait, _sleep):
+        port = "/dev/cu.usbserial-1"
+        mock_find.side_effect = [[port], [], [], [port]]
+        assert wait_for_replug() == port
+        # Waits after the still-present scan and the still-absent scan
+        assert mock_wait.call_count == 2
+
+    @patch("alif_flash.isp._DevWatch.wait")
+    @patch("alif_flash.isp.find_se_uart", return_value=["/dev/cu.usbserial-1"])
+    def test_timeout_if_never_unplugged(self, _find, _wait):
+        assert wait_for_replug(timeout_disappear=0, timeout_total=0) is None
+
+
+class TestMonitor:
+    @patch("alif_flash.isp.serial.Serial")
+    def test_batched_blocking_reads(self, mock_serial):
+        ser = mock_serial.return_value
+        ser.in_waiting = 0
+        chunks = [b'[SES] ', b'boot']
+
+        def read(n):
+            if chunks:
+                return chunks.pop(0)
+            time.sleep(0.01)  # read timeout elapses with no data
+            return b''
+
+        ser.read.side_effect = read
+        r = monitor("/dev/null", duration=0.05)
+        assert r["success"]
+        assert r["output"] == "[SES] boot"
+        assert ser.timeout == 0.05
+        ser.read.assert_called_with(8192)
+        ser.close.assert_called()
+
+    @patch("alif_flash.isp.serial.Serial")
+    def test_negative_duration(self, mock_serial):
+        ser = mock_serial.return_value
+        ser.in_waiting = 0
+        r = monitor("/dev/null", duration=-1)
+        assert r["success"]
+        assert ser.timeout == 0.0
+        ser.read.assert_not_called()
+
+
+class TestWriteSegment:
+    @patch("alif_flash.isp.time.sleep")
+    def test_download_frames_match_make_packet(self, _sleep):
+        """Reused DOWNLOAD_DATA frame matches make_packet for full and short chunks."""
+        data = bytes(i & 0xFF for i in range(DATA_PER_CHUNK * 2 + 16))
+        ser = AckSerial()
+        r = _write_segment(ser, data, 0x80002000, "test.bin")
+        assert r["success"]
+        assert r["chunks"] == 3
+
+        # BURN_MRAM, 3x DOWNLOAD_DATA, DOWNLOAD_DONE
+        assert len(ser.written) == 5
+        for i, frame in enumerate(ser.written[1:4]):
+            chunk = data[i * DATA_PER_CHUNK:(i + 1) * DATA_PER_CHUNK]
+            assert frame == make_packet(CMD_DOWNLOAD_DATA, struct.pack('<H', i) + chunk)
+        assert ser.written[4] == make_packet(CMD_DOWNLOAD_DONE)
+
+    def test_padded_size_appends_zeros(self):
+        """padded_size beyond the data is sent as zeros, even as a pad-only chunk."""
+        data = memoryview(b'\x5A' * DATA_PER_CHUNK)
+        ser = AckSerial()
+        r = _write_segment(ser, data, 0x80002000, "test.bin", padded_size=DATA_PER_CHUNK + 8)
+        assert r["success"]
+        assert r["chunks"] == 2
+        assert ser.written[0] == make_packet(CMD_BURN_MRAM, struct.pack('<II', 0x80002000, DATA_PER_CHUNK + 8))
+        assert ser.written[2][4:-1] == b'\x00' * 8
+
+    @patch("alif_flash.isp.time.sleep")
+    def test_stop_and_wait_writes_frame_directly(self, _sleep):
+        """With window=1 each frame is written from the frame buffer, not a batch copy."""
+        ser = AckSerial()
+        kinds = []
+        write = ser.write
+        ser.write = lambda data: kinds.append(type(data)) or write(data)
+        r = _write_segment(ser, bytes(DATA_PER_CHUNK * 2), 0x80002000, "test.bin", window=1)
+        assert r["success"]
+        assert kinds[1:3] == [memoryview, memoryview]
+
+    @patch("alif_flash.isp.time.sleep")
+    def test_pipelined_window(self, _sleep):
+        """A window > 1 sends the same frames and still waits for every ACK."""
+        data = bytes(DATA_PER_CHUNK * 5)
+        ser = AckSerial()
+        r = _write_segment(ser, data, 0x80002000, "test.bin", window=3)
+        assert r["success"]
+        assert r["chunks"] == 5
+        assert len(ser.written) == 7
+        # BURN_MRAM, [0,1,2] batched, then 3 and 4 as ACKs free the window, DONE
+        assert ser.writes == 5
+
+    @patch("alif_flash.isp.time.sleep")
+    def test_no_ack_reports_progress(self, _sleep):
+        """A missing ACK stops the segment and reports acknowledged chunks."""
+        class DropSerial(AckSerial):
+            def write(self, data):
+                n = super().write(data)
+                if len(self.written) > 3:  # BURN_MRAM + 2 chunks acked
+                    self._rx = b''
+                return n
+
+        data = bytes(DATA_PER_CHUNK * 4)
+        r = _write_segment(DropSerial(), data, 0x80002000, "test.bin")
+        assert not r["success"]
+        assert r["usb_drop"] is True
+        assert r["chunks_written"] == 2
+        assert r["bytes_written"] == DATA_PER_CHUNK * 2
+
+
+class TestWriteSegmentProgress:
+    def test_progress_rate_limited(self, caplog):
+        data = bytes(DATA_PER_CHUNK * 250)
+        with caplog.at_level("INFO", logger="alif_flash.isp"):
+            r = _write_segment(AckSerial(), data, 0x80002000, "test.bin")
+        assert r["success"]
+        progress = [m for m in caplog.messages if "%)" in m]
+        # Completes well within PROGRESS_INTERVAL: only the final line
+        assert len(progress) == 1
+        assert progress[0].startswith("[test.bin] 250/250 (100%)")
+
+
+class TestWriteImage:
+    def _flash(self, content: bytes):
+        ser = AckSerial()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "img.bin")
+            with open(path, "wb") as f:
+                f.write(content)
+            with patch("alif_flash.isp.open_serial", return_value=ser), \
+                    patch("alif_flash.isp.start_isp", return_value=(True, b'')), \
+                    patch("alif_flash.isp.MAX_SEGMENT_SIZE", DATA_PER_CHUNK * 2):
+                r = write_image("/dev/null", path, 0x80002000)
+        payload = b''.join(f[4:-1] for f in ser.written if f[1] == CMD_DOWNLOAD_DATA)
+        return r, payload
+
+    def test_pads_last_segment(self):
+        """Image split into MAX_SEGMENT_SIZE segments, last one zero-padded to 16 bytes."""
+        content = bytes(i & 0xFF for i in range(DATA_PER_CHUNK * 5 + 7))
+        r, payload = self._flash(content)
+        assert r["success"]
+        assert r["original_bytes"] == len(content)
+        assert r["padded_bytes"] == len(content) + 9
+        assert r["segments"] == 3
+        assert payload == content + b'\x00' * 9
+
+    def test_aligned_image_unpadded(self):
+        content = b'\xAB' * (DATA_PER_CHUNK * 2)
+        r, payload = self._flash(content)
+        assert r["success"]
+        assert r["padded_bytes"] == len(content)
+        assert payload == content
+
+
+class TestFlashImages:
+    def test_prefetched_data_passed_in_order(self):
+        """Each image is handed to write_image already loaded, in config order."""
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "config"))
+            os.makedirs(os.path.join(tmp, "images"))
+            with open(os.path.join(tmp, "AppTocPackage.bin"), "wb") as f:
+                f.write(b'\xAA' * 64)
+            with open(os.path.join(tmp, "images", "bl32.bin"), "wb") as f:
+                f.write(b'\xBB' * 32)
+            config_path = os.path.join(tmp, "config", "test.json")
+            with open(config_path, "w") as f:
+                json.dump({"TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"}}, f)
+
+            calls = []
+
+            def fake_write(port, path, addr, data=None):
+                calls.append((os.path.basename(path), addr, bytes(data)))
+                return {"success": True, "file": os.path.basename(path)}
+
+            with patch("alif_flash.isp.write_image", side_effect=fake_write), \
+                    patch("alif_flash.isp.open_serial", return_value=AckSerial()), \
+                    patch("alif_flash.isp.start_isp", return_value=(True, b'')):
+                r = flash_images("/dev/null", config_path)
+
+        assert r["success"]
+        assert [c[0] for c in calls] == [".atoc_erase.bin", "AppTocPackage.bin", "bl32.bin"]
+        assert calls[1] == ("AppTocPackage.bin", 0x80580000 - 64, b'\xAA' * 64)
+        assert calls[2] == ("bl32.bin", 0x80002000, b'\xBB' * 32)
+        assert r["total_bytes"] == 8192 + 64 + 32
+
+    def test_missing_image(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "config"))
+            with open(os.path.join(tmp, "AppTocPackage.bin"), "wb") as f:
+                f.write(b'\xAA' * 64)
+            config_path = os.path.join(tmp, "config", "test.json")
+            with open(config_path, "w") as f:
+                json.dump({"TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"}}, f)
+
+            with patch("alif_flash.isp.enter_maintenance") as maint:
+                r = flash_images("/dev/null", config_path, enter_maint=True)
+
+        assert r["success"] is False
+        assert r["message"].startswith("Image not found")
+        maint.assert_not_called()  # checked before asking for a power cycle
+
+    def test_parsed_config_not_reread(self):
+        """A config dict passed in is used as-is; config_path only locates the build."""
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "images"))
+            with open(os.path.join(tmp, "AppTocPackage.bin"), "wb") as f:
+                f.write(b'\xAA' * 64)
+            with open(os.path.join(tmp, "images", "bl32.bin"), "wb") as f:
+                f.write(b'\xBB' * 32)
+            config_path = os.path.join(tmp, "config", "missing.json")
+            config = {"TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"}}
+
+            with patch("alif_flash.isp.write_image",
+                       return_value={"success": True}) as write, \
+                    patch("alif_flash.isp.open_serial", return_value=AckSerial()), \
+                    patch("alif_flash.isp.start_isp", return_value=(True, b'')):
+                r = flash_images("/dev/null", config_path, config=config)
+
+        assert r["success"]
+        assert write.call_args_list[-1].args[2] == 0x80002000
+
+
+class TestLoadImage:
+    def test_cached_until_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "img.bin")
+            with open(path, "wb") as f:
+                f.write(b'\x01' * 32)
+            first = _load_image(path)
+            assert _load_image(path) is first
+
+            with open(path, "wb") as f:
+                f.write(b'\x02' * 48)
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+            assert _load_image(path) == b'\x02' * 48
+
+    def test_uncached_load_not_kept(self, tmp_path):
+        path = tmp_path / "staging.bin"
+        path.write_bytes(b'\x00' * 16)
+        first = _load_image(str(path), cache=False)
+        assert _load_image(str(path), cache=False) is not first
+
+    def test_bounded_by_total_bytes(self, tmp_path):
+        paths = []
+        for i in range(3):
+            path = tmp_path / f"img{i}.bin"
+            path.write_bytes(bytes([i]) * 64)
+            paths.append(str(path))
+        with patch("alif_flash.isp.IMAGE_CACHE_BYTES", 128):
+            first = _load_image(paths[0])
+            for path in paths[1:]:
+                _load_image(path)
+            assert _load_image(paths[0]) is not first  # evicted
+            assert _load_image(paths[2]) is _load_image(paths[2])
+
+    def test_clear(self, tmp_path):
+        path = tmp_path / "img.bin"
+        path.write_bytes(b'\x01' * 16)
+        first = _load_image(str(path))
+        clear_image_cache()
+        assert _load_image(str(path)) is not first
+
+
 class TestConstants:
     def test_data_per_chunk(self):
         assert DATA_PER_CHUNK == 240
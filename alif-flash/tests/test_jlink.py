@@ -2,9 +2,15 @@
 
 import json
 import os
+import shutil
+import subprocess
+import sys
 import tempfile
+from types import SimpleNamespace
 from unittest.mock import patch
 
+import pytest
+
 from alif_flash.jlink import (
     ATOC_MRAM_END,
     ATOC_MRAM_START,
@@ -15,7 +21,16 @@ from alif_flash.jlink import (
     OSPI_FLM_NAME,
     JLINK_SCRIPT_FILE,
     _atoc_warnings,
+    _file_sizes,
+    _JLinkSession,
+    _flash_in_process,
+    _jlink_speed,
+    _ospi_erase_ranges,
+    _stage_as_bin,
+    install_device_def,
     _parse_loadbin_output,
+    _parse_loadbin_stream,
+    _run_jlink,
     check_setup,
     flash_from_config,
     JLINK_DEVICES_DIR,
@@ -73,6 +88,23 @@ class TestParseLoadbinOutput:
     def test_empty(self):
         assert _parse_loadbin_output("") == []
 
+    def test_download_without_result_dropped(self):
+        """A result line belongs to the most recent download only."""
+        stdout = (
+            "Downloading file [/tmp/bl32.bin]...\n"
+            "Downloading file [/tmp/xipImage]...\n"
+            "O.K.\n"
+        )
+        assert _parse_loadbin_output(stdout) == [{"file": "xipImage", "success": True}]
+
+    def test_stream_reports_file_start(self):
+        started = []
+        lines = ["Downloading file [/tmp/bl32.bin]...", "O.K.",
+                 "Downloading file [/tmp/xipImage]..."]
+        results = list(_parse_loadbin_stream(lines, started.append))
+        assert started == ["bl32.bin", "xipImage"]
+        assert results == [{"file": "bl32.bin", "success": True}]
+
     def test_noise_in_output(self):
         stdout = (
             "SEGGER J-Link Commander V8.70\n"
@@ -126,6 +158,152 @@ class TestParseLoadbinOutput:
         assert results[1]["success"] is False
 
 
+class TestRunJlink:
+    """_run_jlink against a stand-in JLinkExe shell script."""
+
+    @pytest.fixture(autouse=True)
+    def _speed(self):
+        with patch("alif_flash.jlink._jlink_speed", return_value="auto"):
+            yield
+
+    @staticmethod
+    def _fake_exe(tmp_path, body):
+        exe = tmp_path / "JLinkExe"
+        exe.write_text("#!/bin/sh\n" + body)
+        exe.chmod(0o755)
+        return str(exe)
+
+    def test_streams_results(self, tmp_path):
+        exe = self._fake_exe(tmp_path, (
+            "echo 'Connecting to J-Link via USB...O.K.'\n"
+            "echo '****** Error: Failed to halt CPU.'\n"
+            "echo 'Downloading file [/tmp/bl32.bin]...'\n"
+            "echo 'O.K.'\n"
+            "echo 'Verify successful.'\n"
+        ))
+        with patch("alif_flash.jlink.JLINK_EXE", exe):
+            r = _run_jlink("exit\n")
+        assert r["success"] is True
+        assert r["files"] == [{"file": "bl32.bin", "success": True}]
+        assert r["verified"] is True
+
+    def test_write_failure(self, tmp_path):
+        exe = self._fake_exe(tmp_path, (
+            "echo 'Downloading file [/tmp/bl32.bin]...'\n"
+            "echo 'Writing target memory failed.'\n"
+        ))
+        with patch("alif_flash.jlink.JLINK_EXE", exe):
+            r = _run_jlink("exit\n")
+        assert r["success"] is False
+        assert r["message"] == "MRAM write failed"
+        assert "Writing target memory failed" in r["stdout"]
+
+    def test_verify_failure_stops_early(self, tmp_path):
+        import time
+        exe = self._fake_exe(tmp_path, (
+            "echo 'Downloading file [/tmp/bl32.bin]...'\n"
+            "echo 'O.K.'\n"
+            "echo 'Verify failed @ address 0x80002000'\n"
+            "exec sleep 5\n"
+        ))
+        t0 = time.monotonic()
+        with patch("alif_flash.jlink.JLINK_EXE", exe):
+            r = _run_jlink("exit\n")
+        assert time.monotonic() - t0 < 2
+        assert r["files"] == [{"file": "bl32.bin", "success": True}]
+        assert r["verified"] is False
+
+    def test_timeout(self, tmp_path):
+        exe = self._fake_exe(tmp_path, "exec sleep 5\n")
+        with patch("alif_flash.jlink.JLINK_EXE", exe):
+            r = _run_jlink("exit\n", timeout=0.2)
+        assert r["success"] is False
+        assert "timed out" in r["message"]
+
+    def test_cancel(self, tmp_path):
+        import time
+        exe = self._fake_exe(tmp_path, "exec sleep 5\n")
+        t0 = time.monotonic()
+        with patch("alif_flash.jlink.JLINK_EXE", exe):
+            r = _run_jlink("exit\n", should_cancel=lambda: time.monotonic() - t0 > 0.1)
+        assert r == {"success": False, "message": "JLinkExe cancelled"}
+        assert time.monotonic() - t0 < 2
+
+    def test_script_readable_by_child(self, tmp_path):
+        out = tmp_path / "script.txt"
+        exe = self._fake_exe(tmp_path, (
+            'while [ $# -gt 0 ]; do [ "$1" = -CommandFile ] && cat "$2" > '
+            + str(out) + '; shift; done\n'))
+        with patch("alif_flash.jlink.JLINK_EXE", exe):
+            assert _run_jlink("loadbin /tmp/a.bin 0x80002000\nexit\n")["success"]
+        assert out.read_text() == "loadbin /tmp/a.bin 0x80002000\nexit\n"
+
+    def test_missing_exe(self, tmp_path):
+        with patch("alif_flash.jlink.JLINK_EXE", str(tmp_path / "nope")):
+            r = _run_jlink("exit\n")
+        assert r["success"] is False
+        assert "not found" in r["message"]
+
+
+class TestJlinkSpeed:
+    @pytest.fixture(autouse=True)
+    def _cache(self, tmp_path):
+        exe = tmp_path / "JLinkExe"
+        exe.write_text("#!/bin/sh\necho 'Connecting to target via SWD'\n"
+                       "echo 'InitTarget() end - Took 2.1ms'\n"
+                       "echo 'Found SW-DP with ID 0x6BA02477'\n"
+                       "echo 'Target interface speed: 12000 kHz (Auto)'\n")
+        exe.chmod(0o755)
+        self.exe = exe
+        with patch("alif_flash.jlink.JLINK_EXE", str(exe)), \
+             patch("alif_flash.jlink.SPEED_CACHE", str(tmp_path / "speed.json")), \
+             patch("alif_flash.jlink._speed_cache", None):
+            yield
+
+    def test_probed_once_and_cached(self):
+        with patch("alif_flash.jlink._probe_max_speed", return_value=12000) as probe:
+            assert _jlink_speed() == "12000"
+            assert _jlink_speed() == "12000"
+        probe.assert_called_once()
+
+    def test_probe_parses_speed(self):
+        assert _jlink_speed() == "12000"
+
+    def test_rebuilt_exe_reprobed(self):
+        with patch("alif_flash.jlink._probe_max_speed", side_effect=[12000, None]) as probe:
+            assert _jlink_speed() == "12000"
+            os.utime(self.exe, ns=(0, 0))
+            assert _jlink_speed() == "auto"
+        assert probe.call_count == 2
+
+    def test_failed_probe_not_cached(self, tmp_path):
+        with patch("alif_flash.jlink._probe_max_speed", side_effect=[None, 12000]) as probe:
+            assert _jlink_speed() == "auto"
+            assert not (tmp_path / "speed.json").exists()
+            assert _jlink_speed() == "12000"
+        assert probe.call_count == 2
+        assert list(json.loads((tmp_path / "speed.json").read_text()).values()) == [12000]
+
+    def test_probe_targets_serial(self):
+        with patch("alif_flash.jlink._probe_max_speed", return_value=12000) as probe:
+            assert _jlink_speed(serial="123456") == "12000"
+            assert _jlink_speed() == "12000"
+        assert probe.call_args_list[0].args == (None, "123456")
+        assert probe.call_count == 2  # cached per probe
+
+    def test_probe_passes_usb_serial(self):
+        with patch("alif_flash.jlink.subprocess.run", wraps=subprocess.run) as run:
+            assert _jlink_speed(serial="123456") == "12000"
+        cmd = run.call_args.args[0]
+        assert cmd[cmd.index("-USB") + 1] == "123456"
+
+    def test_explicit_speed_not_probed(self):
+        with patch("alif_flash.jlink.SPEED", 4000), \
+             patch("alif_flash.jlink._probe_max_speed") as probe:
+            assert _jlink_speed() == "4000"
+        probe.assert_not_called()
+
+
 class TestMramLayout:
     def test_all_components_defined(self):
         assert "tfa" in MRAM_LAYOUT
@@ -145,6 +323,14 @@ class TestMramLayout:
         assert MRAM_LAYOUT["kernel"]["file"] == "xipImage"
         assert MRAM_LAYOUT["rootfs"]["file"] == "cramfs-xip.img"
 
+    def test_read_only(self):
+        """flash_from_config passes its own layout; the default can't be mutated."""
+        import pytest
+        with pytest.raises(TypeError):
+            MRAM_LAYOUT["ospi_hdr"] = {"file": "x.bin", "addr": 0}
+        with pytest.raises(TypeError):
+            MRAM_LAYOUT["kernel"]["addr"] = 0xC0100000
+
     def test_addresses_non_overlapping(self):
         """Components should not overlap in MRAM."""
         addrs = sorted(MRAM_LAYOUT[k]["addr"] for k in MRAM_LAYOUT)
@@ -188,267 +374,698 @@ class TestFlashImages:
             assert "not found" in result["message"]
 
 
+class FakeSession:
+    """Stand-in for _JLinkSession recording loads."""
+
+    open_error = None
+
+    def __init__(self, device=None, serial_no=None):
+        self.loaded = []
+        self.verified = []
+
+    def open(self):
+        if self.open_error:
+            raise self.open_error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def load(self, path, addr, data=None):
+        self.loaded.append((path, addr))
+        if path.endswith("bad.bin"):
+            return {"success": False, "error": "JLinkFlashException"}
+        return {"success": True}
+
+    def verify(self, data, addr):
+        self.verified.append((data, addr))
+        return data == b"good"
+
+
+class TestFlashInProcess:
+    LOAD_FILES = [
+        ("tfa", "/tmp/bl32.bin", "/tmp/bl32.bin", 0x80002000, 4096),
+        ("dtb", "/tmp/jlink_x/appkit-e7.bin", "/tmp/appkit-e7.dtb", 0x80010000, 512),
+    ]
+
+    def test_pylink_missing_falls_back(self):
+        with patch.dict(sys.modules, {"pylink": None}):
+            assert _flash_in_process(self.LOAD_FILES, verify=False) is None
+
+    def test_connect_failure_falls_back(self):
+        class NoProbe(FakeSession):
+            open_error = RuntimeError("No J-Link emulators found")
+        with patch("alif_flash.jlink._JLinkSession", NoProbe):
+            assert _flash_in_process(self.LOAD_FILES, verify=False) is None
+
+    def test_one_session_for_all_files(self):
+        with patch("alif_flash.jlink._JLinkSession", FakeSession), \
+             patch("alif_flash.jlink._read_file", return_value=b"good") as read:
+            results, verified = _flash_in_process(self.LOAD_FILES, verify=True)
+        assert results == [
+            {"file": "bl32.bin", "success": True},
+            {"file": "appkit-e7.dtb", "success": True},
+        ]
+        assert verified is True
+        assert [c.args[0] for c in read.call_args_list] == [
+            "/tmp/bl32.bin", "/tmp/jlink_x/appkit-e7.bin"]
+
+    def test_raw_image_read_once_for_load_and_verify(self):
+        files = [("dtb", "/tmp/appkit-e7.dtb", "/tmp/appkit-e7.dtb", 0x80010000, 4)]
+        loads = []
+
+        class RawSession(FakeSession):
+            def load(self, path, addr, data=None):
+                loads.append(data)
+                return super().load(path, addr, data)
+
+        with patch("alif_flash.jlink._JLinkSession", RawSession), \
+             patch("alif_flash.jlink._read_file", return_value=b"good") as read:
+            _, verified = _flash_in_process(files, verify=True)
+        assert verified is True
+        assert loads == [b"good"]
+        read.assert_called_once_with("/tmp/appkit-e7.dtb")
+
+    def test_bin_not_read_without_verify(self):
+        with patch("alif_flash.jlink._JLinkSession", FakeSession), \
+             patch("alif_flash.jlink._read_file") as read:
+            _flash_in_process(self.LOAD_FILES, verify=False)
+        read.assert_not_called()
+
+    def test_verify_mismatch(self):
+        with patch("alif_flash.jlink._JLinkSession", FakeSession), \
+             patch("alif_flash.jlink._read_file", return_value=b"bad"):
+            _, verified = _flash_in_process(self.LOAD_FILES, verify=True)
+        assert verified is False
+
+    def test_per_file_failure(self):
+        files = [("x", "/tmp/bad.bin", "/tmp/bad.bin", 0x80002000, 240)]
+        with patch("alif_flash.jlink._JLinkSession", FakeSession):
+            results, verified = _flash_in_process(files, verify=False)
+        assert results[0]["success"] is False
+        assert verified is None
+
+    def test_no_verify_after_failed_load(self):
+        files = [("x", "/tmp/bad.bin", "/tmp/bad.bin", 0x80002000, 240)]
+        with patch("alif_flash.jlink._JLinkSession", FakeSession), \
+             patch("alif_flash.jlink._read_file", return_value=b"good"), \
+             patch.object(FakeSession, "verify") as verify:
+            results, verified = _flash_in_process(files, verify=True)
+        assert results[0]["success"] is False
+        assert verified is None
+        verify.assert_not_called()
+
+
+class TestSessionVerify:
+    class JLinkException(Exception):
+        pass
+
+    def _session(self, read):
+        session = _JLinkSession.__new__(_JLinkSession)
+        session._pylink = SimpleNamespace(errors=SimpleNamespace(JLinkException=self.JLinkException))
+        session.jlink = SimpleNamespace(memory_read8=read)
+        return session
+
+    def test_match(self):
+        session = self._session(lambda addr, n: list(b"good"[:n]))
+        assert session.verify(b"good", 0x80002000) is True
+
+    def test_readback_error_is_failure(self):
+        def read(addr, n):
+            raise self.JLinkException("target reset")
+        assert self._session(read).verify(b"good", 0x80002000) is False
+
+
+class TestFileSizes:
+    def test_sizes_in_order_with_missing(self, tmp_path):
+        paths = []
+        for i in range(4):
+            p = tmp_path / f"f{i}.bin"
+            p.write_bytes(b"x" * i)
+            paths.append(str(p))
+        paths.insert(2, str(tmp_path / "missing.bin"))
+        assert _file_sizes(paths) == [0, 1, None, 2, 3]
+
+    def test_single(self, tmp_path):
+        assert _file_sizes([str(tmp_path / "nope")]) == [None]
+
+
+class TestOspiEraseRanges:
+    def test_gap_between_images_not_erased(self):
+        ranges = _ospi_erase_ranges([(0xC0300000, 0x1000), (0xC0100000, 0x20001)])
+        assert ranges == [(0xC0100000, 0xC0130000), (0xC0300000, 0xC0310000)]
+
+    def test_shared_sector_merged(self):
+        ranges = _ospi_erase_ranges([(0xC0000000, 0x10800), (0xC0010800, 0x800)])
+        assert ranges == [(0xC0000000, 0xC0020000)]
+
+    def test_unaligned_start(self):
+        assert _ospi_erase_ranges([(0xC0008000, 0x100)]) == [(0xC0000000, 0xC0010000)]
+
+    def test_empty(self):
+        assert _ospi_erase_ranges([]) == []
+
+
+class TestStageAsBin:
+    def test_hardlink(self, tmp_path):
+        src = tmp_path / "appkit-e7.dtb"
+        src.write_bytes(b"\xd0\x0d\xfe\xed")
+        stage = tmp_path / "stage"
+        stage.mkdir()
+        dst = _stage_as_bin(str(src), str(stage))
+        assert dst == str(stage / "appkit-e7.bin")
+        assert os.stat(dst).st_ino == src.stat().st_ino
+
+    def test_falls_back_to_symlink_then_copy(self, tmp_path):
+        src = tmp_path / "cramfs-xip.img"
+        src.write_bytes(b"rootfs")
+        stage = tmp_path / "stage"
+        stage.mkdir()
+        with patch("alif_flash.jlink.os.link", side_effect=OSError("EXDEV")):
+            dst = _stage_as_bin(str(src), str(stage))
+            assert os.path.islink(dst)
+        os.unlink(dst)
+        with patch("alif_flash.jlink.os.link", side_effect=OSError("EXDEV")), \
+             patch("alif_flash.jlink.os.symlink", side_effect=OSError("EPERM")), \
+             patch("alif_flash.jlink.shutil.copy2") as copy2:
+            dst = _stage_as_bin(str(src), str(stage))
+        copy2.assert_not_called()
+        assert not os.path.islink(dst)
+        with open(dst, "rb") as f:
+            assert f.read() == b"rootfs"
+
+
+class TestSkipUnchanged:
+    LAYOUT = {"tfa": {"file": "bl32.bin", "addr": 0x80002000},
+              "dtb": {"file": "appkit-e7.dtb", "addr": 0x80010000}}
+
+    def _flash(self, tmp_path, **kwargs):
+        from alif_flash.jlink import flash_images
+
+        def fake_flash(load_files, verify, device=None, on_file_start=None, serial_no=None):
+            return [{"file": os.path.basename(op), "success": True}
+                    for _, _, op, _, _ in load_files], (True if verify else None)
+
+        with patch("alif_flash.jlink.FLASH_MANIFEST", str(tmp_path / "manifest.json")), \
+             patch("alif_flash.jlink._setup_ready", {None}), \
+             patch("alif_flash.jlink._flash_in_process", side_effect=fake_flash) as fl, \
+             patch("alif_flash.isp.reset_via_jlink", return_value={"success": True}):
+            r = flash_images(str(tmp_path), layout=self.LAYOUT, **kwargs)
+        return r, fl
+
+    def test_second_flash_skipped(self, tmp_path):
+        (tmp_path / "bl32.bin").write_bytes(b"tfa")
+        (tmp_path / "appkit-e7.dtb").write_bytes(b"dtb")
+        self._flash(tmp_path, skip_unchanged=True)
+
+        (tmp_path / "appkit-e7.dtb").write_bytes(b"dtb2")
+        r, fl = self._flash(tmp_path, skip_unchanged=True)
+        assert r["success"]
+        assert [lf[0] for lf in fl.call_args.args[0]] == ["dtb"]
+        assert r["files"][0] == {"file": "bl32.bin", "success": True,
+                                 "skipped": True, "size_bytes": 3}
+
+        r, fl = self._flash(tmp_path, skip_unchanged=True)
+        assert r["method"] == "skipped"
+        fl.assert_not_called()
+
+    def test_unverified_entry_reflashed_for_verify(self, tmp_path):
+        (tmp_path / "bl32.bin").write_bytes(b"tfa")
+        (tmp_path / "appkit-e7.dtb").write_bytes(b"dtb")
+        self._flash(tmp_path, skip_unchanged=True)
+        r, fl = self._flash(tmp_path, skip_unchanged=True, verify=True)
+        assert len(fl.call_args.args[0]) == 2
+
+    def test_plain_flash_invalidates(self, tmp_path):
+        (tmp_path / "bl32.bin").write_bytes(b"tfa")
+        (tmp_path / "appkit-e7.dtb").write_bytes(b"dtb")
+        self._flash(tmp_path, skip_unchanged=True)
+        self._flash(tmp_path, components=["tfa"])
+        r, fl = self._flash(tmp_path, skip_unchanged=True)
+        assert [lf[0] for lf in fl.call_args.args[0]] == ["tfa"]
+
+
+class TestParallelProbes:
+    LAYOUT = {"tfa": {"file": "bl32.bin", "addr": 0x80002000},
+              "rootfs": {"file": "rootfs.bin", "addr": 0xC0300000}}
+
+    def _flash(self, tmp_path, serials, in_process=None):
+        from alif_flash.jlink import flash_images
+        (tmp_path / "bl32.bin").write_bytes(b"tfa")
+        (tmp_path / "rootfs.bin").write_bytes(b"rootfs")
+
+        def fake_run(script, device=None, timeout=0, on_file_start=None,
+                     should_cancel=None, serial=None):
+            files = [os.path.basename(line.split()[1])
+                     for line in script.splitlines() if line.startswith("loadbin")]
+            return {"success": True, "stdout": "", "verified": False,
+                    "files": [{"file": f, "success": True, "serial": serial} for f in files]}
+
+        with patch.dict(os.environ, {"ALIF_JLINK_SERIALS": serials}), \
+             patch("alif_flash.jlink.FLASH_MANIFEST", str(tmp_path / "manifest.json")), \
+             patch("alif_flash.jlink._setup_ready", {None}), \
+             patch("alif_flash.jlink._flash_in_process",
+                   side_effect=in_process, return_value=None), \
+             patch("alif_flash.jlink._run_jlink", side_effect=fake_run) as run, \
+             patch("alif_flash.isp.reset_via_jlink", return_value={"success": True}):
+            r = flash_images(str(tmp_path), layout=self.LAYOUT)
+        return r, run
+
+    def test_mram_and_ospi_split_across_probes(self, tmp_path):
+        r, run = self._flash(tmp_path, "111, 222")
+        assert r["success"]
+        assert run.call_count == 2
+        assert {f["file"]: f["serial"] for f in r["files"]} == {
+            "bl32.bin": "111", "rootfs.bin": "222"}
+
+    def test_parallel_probes_use_pylink(self, tmp_path):
+        def fake_flash(load_files, verify, device=None, on_file_start=None, serial_no=None):
+            return [{"file": os.path.basename(op), "success": True, "serial": serial_no}
+                    for _, _, op, _, _ in load_files], None
+
+        r, run = self._flash(tmp_path, "111,222", in_process=fake_flash)
+        assert r["method"] == "jlink_pylink"
+        run.assert_not_called()
+        assert {f["file"]: f["serial"] for f in r["files"]} == {
+            "bl32.bin": "111", "rootfs.bin": "222"}
+
+    def test_single_probe_one_session(self, tmp_path):
+        r, run = self._flash(tmp_path, "")
+        assert r["success"]
+        run.assert_called_once()
+        assert len(r["files"]) == 2
+
+
+class TestStagingOnlyForJLinkExe:
+    LAYOUT = {"dtb": {"file": "appkit-e7.dtb", "addr": 0x80010000}}
+
+    def _flash(self, tmp_path, in_process):
+        from alif_flash.jlink import flash_images
+        (tmp_path / "appkit-e7.dtb").write_bytes(b"dtb")
+        scripts = []
+
+        def fake_run(script, device=None, timeout=0, on_file_start=None,
+                     should_cancel=None, serial=None):
+            scripts.append(script)
+            files = [os.path.basename(line.split()[1])
+                     for line in script.splitlines() if line.startswith("loadbin")]
+            return {"success": True, "stdout": "", "verified": False,
+                    "files": [{"file": f, "success": True} for f in files]}
+
+        with patch("alif_flash.jlink.FLASH_MANIFEST", str(tmp_path / "manifest.json")), \
+             patch("alif_flash.jlink._setup_ready", {None}), \
+             patch("alif_flash.jlink._flash_in_process",
+                   side_effect=in_process, return_value=None), \
+             patch("alif_flash.jlink._run_jlink", side_effect=fake_run), \
+             patch("alif_flash.isp.reset_via_jlink", return_value={"success": True}):
+            r = flash_images(str(tmp_path), layout=self.LAYOUT)
+        return r, scripts
+
+    def test_pylink_gets_original_path(self, tmp_path):
+        seen = []
+
+        def fake_flash(load_files, verify, device=None, on_file_start=None, serial_no=None):
+            seen.extend(lp for _, lp, *_ in load_files)
+            return [{"file": "appkit-e7.dtb", "success": True}], None
+
+        r, scripts = self._flash(tmp_path, fake_flash)
+        assert r["success"] and not scripts
+        assert seen == [str(tmp_path / "appkit-e7.dtb")]
+        assert not any(n.startswith(".jlink_") for n in os.listdir(tmp_path))
+
+    def test_jlinkexe_gets_staged_bin(self, tmp_path):
+        r, scripts = self._flash(tmp_path, None)
+        assert r["success"]
+        assert "appkit-e7.bin" in scripts[0]
+        assert r["files"][0]["file"] == "appkit-e7.dtb"
+        assert not any(n.startswith(".jlink_") for n in os.listdir(tmp_path))
+
+    def test_jlinkexe_stages_every_non_bin(self, tmp_path):
+        from alif_flash.jlink import flash_images
+        layout = {"dtb": {"file": "appkit-e7.dtb", "addr": 0x80010000},
+                  "kernel": {"file": "xipImage", "addr": 0x80020000},
+                  "tfa": {"file": "bl32.bin", "addr": 0x80002000}}
+        for info in layout.values():
+            (tmp_path / info["file"]).write_bytes(b"x")
+        scripts = []
+
+        def fake_run(script, device=None, timeout=0, on_file_start=None,
+                     should_cancel=None, serial=None):
+            scripts.append(script)
+            return {"success": True, "stdout": "", "verified": False, "files": []}
+
+        with patch("alif_flash.jlink.FLASH_MANIFEST", str(tmp_path / "manifest.json")), \
+             patch("alif_flash.jlink._setup_ready", {None}), \
+             patch("alif_flash.jlink._flash_in_process", return_value=None), \
+             patch("alif_flash.jlink._run_jlink", side_effect=fake_run), \
+             patch("alif_flash.isp.reset_via_jlink", return_value={"success": True}):
+            flash_images(str(tmp_path), layout=layout)
+
+        loads = [line.split()[1] for line in scripts[0].splitlines()
+                 if line.startswith("loadbin")]
+        assert [os.path.basename(p) for p in loads] == ["appkit-e7.bin", "xipImage.bin", "bl32.bin"]
+        assert loads[2] == str(tmp_path / "bl32.bin")
+
+
+class TestFlashCancel:
+    LAYOUT = {"tfa": {"file": "bl32.bin", "addr": 0x80002000}}
+
+    def _flash(self, tmp_path, should_cancel):
+        from alif_flash.jlink import flash_images
+        (tmp_path / "bl32.bin").write_bytes(b"x")
+        with patch("alif_flash.jlink.FLASH_MANIFEST", str(tmp_path / "manifest.json")), \
+             patch("alif_flash.jlink._setup_ready", {None}), \
+             patch("alif_flash.jlink._flash_in_process", return_value=None), \
+             patch("alif_flash.jlink._run_jlink",
+                   return_value={"success": False, "message": "JLinkExe cancelled"}) as run, \
+             patch("alif_flash.isp.reset_via_jlink", return_value={"success": True}):
+            r = flash_images(str(tmp_path), layout=self.LAYOUT,
+                             should_cancel=should_cancel)
+        return r, run
+
+    def test_callback_reaches_jlinkexe(self, tmp_path):
+        cancel = lambda: False
+        r, run = self._flash(tmp_path, cancel)
+        assert not r["success"]
+        assert run.call_args.kwargs["should_cancel"] is cancel
+
+    def test_cancelled_before_start(self, tmp_path):
+        r, run = self._flash(tmp_path, lambda: True)
+        assert not r["success"]
+        run.assert_not_called()
+
+
+class TestSetupCache:
+    @patch("alif_flash.jlink._setup_ready", set())
+    @patch("alif_flash.jlink.check_setup", return_value={"ready": True, "issues": []})
+    def test_check_setup_once_per_device(self, mock_check):
+        from alif_flash.jlink import flash_images
+        for _ in range(2):
+            r = flash_images("/nonexistent", components=["bogus"])
+            assert "Unknown component" in r["message"]
+        mock_check.assert_called_once()
+
+    @patch("alif_flash.jlink._setup_ready", set())
+    @patch("alif_flash.jlink.check_setup",
+           return_value={"ready": False, "issues": ["JLinkExe not found at x"]})
+    def test_failed_setup_not_cached(self, mock_check):
+        from alif_flash.jlink import flash_images
+        for _ in range(2):
+            assert flash_images("/nonexistent")["message"] == "JLinkExe not installed"
+        assert mock_check.call_count == 2
+
+
 class TestFlashFromConfig:
     """Tests for flash_from_config config parsing and generic key handling."""
 
-    def _make_config_dir(self, tmp, config_data):
-        """Create a config dir structure: tmp/config/<name>.json + tmp/images/ + tmp/AppTocPackage.bin."""
+    @pytest.fixture
+    def make_config_dir(self, tmp_path):
+        """Factory for tmp_path/config/test.json + tmp_path/images/ + tmp_path/AppTocPackage.bin."""
+        tmp = str(tmp_path)
         config_dir = os.path.join(tmp, "config")
         images_dir = os.path.join(tmp, "images")
-        os.makedirs(config_dir, exist_ok=True)
-        os.makedirs(images_dir, exist_ok=True)
-        config_path = os.path.join(config_dir, "test.json")
-        with open(config_path, "w") as f:
-            json.dump(config_data, f)
+        os.makedirs(config_dir)
+        os.makedirs(images_dir)
         # flash_from_config needs AppTocPackage.bin in the build dir (parent of config/)
-        atoc_path = os.path.join(tmp, "AppTocPackage.bin")
-        with open(atoc_path, "wb") as f:
+        with open(os.path.join(tmp, "AppTocPackage.bin"), "wb") as f:
             f.write(b'\x00' * 1024)
-        return config_path, images_dir
+
+        def make(config_data):
+            config_path = os.path.join(config_dir, "test.json")
+            with open(config_path, "w") as f:
+                json.dump(config_data, f)
+            return config_path, images_dir
+        return make
 
     @patch("alif_flash.jlink.flash_images")
-    def test_known_keys_processed(self, mock_flash):
+    def test_known_keys_processed(self, mock_flash, make_config_dir):
         """Standard TFA/KERNEL keys are passed through via ATOC_KEY_MAP."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "DEVICE": {"partNumber": "AE722F80F55D5AS"},
-                "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
-                "KERNEL": {"binary": "xipImage", "mramAddress": "0x80020000"},
-            }
-            config_path, images_dir = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            mock_flash.assert_called_once()
-            call_args = mock_flash.call_args
-            assert images_dir == call_args[0][0]
-            components = call_args[0][1]
-            assert "tfa" in components
-            assert "kernel" in components
+        config = {
+            "DEVICE": {"partNumber": "AE722F80F55D5AS"},
+            "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
+            "KERNEL": {"binary": "xipImage", "mramAddress": "0x80020000"},
+        }
+        config_path, images_dir = make_config_dir(config)
+        flash_from_config(config_path)
+        mock_flash.assert_called_once()
+        call_args = mock_flash.call_args
+        assert images_dir == call_args[0][0]
+        components = call_args[0][1]
+        assert "tfa" in components
+        assert "kernel" in components
 
     @patch("alif_flash.jlink.flash_images")
-    def test_nonstandard_key_processed(self, mock_flash):
+    def test_nonstandard_key_processed(self, mock_flash, make_config_dir):
         """Non-standard keys like OSPI_HDR are processed generically."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "DEVICE": {"partNumber": "AE722F80F55D5AS"},
-                "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
-                "OSPI_HDR": {"binary": "ospi_header.bin", "mramAddress": "0x80001000"},
-            }
-            config_path, images_dir = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            mock_flash.assert_called_once()
-            components = mock_flash.call_args[0][1]
-            assert "tfa" in components
-            assert "ospi_hdr" in components
+        config = {
+            "DEVICE": {"partNumber": "AE722F80F55D5AS"},
+            "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
+            "OSPI_HDR": {"binary": "ospi_header.bin", "mramAddress": "0x80001000"},
+        }
+        config_path, images_dir = make_config_dir(config)
+        flash_from_config(config_path)
+        mock_flash.assert_called_once()
+        components = mock_flash.call_args[0][1]
+        assert "tfa" in components
+        assert "ospi_hdr" in components
 
     @patch("alif_flash.jlink.flash_images")
-    def test_nonstandard_key_in_mram_layout(self, mock_flash):
+    def test_nonstandard_key_in_mram_layout(self, mock_flash, make_config_dir):
         """Non-standard keys get injected into MRAM_LAYOUT with correct addr/file."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "OSPI_HDR": {"binary": "ospi_header.bin", "mramAddress": "0x80001000"},
-                "TESTDATA": {"binary": "test.bin", "mramAddress": "0x80500000"},
-            }
-            config_path, images_dir = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            components = mock_flash.call_args[0][1]
-            assert "ospi_hdr" in components
-            assert "testdata" in components
+        config = {
+            "OSPI_HDR": {"binary": "ospi_header.bin", "mramAddress": "0x80001000"},
+            "TESTDATA": {"binary": "test.bin", "mramAddress": "0x80500000"},
+        }
+        config_path, images_dir = make_config_dir(config)
+        flash_from_config(config_path)
+        components = mock_flash.call_args[0][1]
+        assert "ospi_hdr" in components
+        assert "testdata" in components
 
     @patch("alif_flash.jlink.flash_images")
-    def test_nonstandard_key_cleaned_up(self, mock_flash):
+    def test_nonstandard_key_cleaned_up(self, mock_flash, make_config_dir):
         """Non-standard keys are removed from MRAM_LAYOUT after flash."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "OSPI_HDR": {"binary": "ospi_header.bin", "mramAddress": "0x80001000"},
-            }
-            config_path, _ = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            assert "ospi_hdr" not in MRAM_LAYOUT
+        config = {
+            "OSPI_HDR": {"binary": "ospi_header.bin", "mramAddress": "0x80001000"},
+        }
+        config_path, _ = make_config_dir(config)
+        flash_from_config(config_path)
+        assert "ospi_hdr" not in MRAM_LAYOUT
 
     @patch("alif_flash.jlink.flash_images")
-    def test_disabled_entry_skipped(self, mock_flash):
+    def test_disabled_entry_skipped(self, mock_flash, make_config_dir):
         """Entries with disabled=true are skipped."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
-                "OSPI_HDR": {"binary": "ospi.bin", "mramAddress": "0x80001000",
-                             "disabled": True},
-            }
-            config_path, _ = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            components = mock_flash.call_args[0][1]
-            assert "tfa" in components
-            assert "ospi_hdr" not in components
+        config = {
+            "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
+            "OSPI_HDR": {"binary": "ospi.bin", "mramAddress": "0x80001000",
+                         "disabled": True},
+        }
+        config_path, _ = make_config_dir(config)
+        flash_from_config(config_path)
+        components = mock_flash.call_args[0][1]
+        assert "tfa" in components
+        assert "ospi_hdr" not in components
 
     @patch("alif_flash.jlink.flash_images")
-    def test_device_key_skipped(self, mock_flash):
+    def test_device_key_skipped(self, mock_flash, make_config_dir):
         """DEVICE key is always skipped (not an image entry)."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "DEVICE": {"partNumber": "AE722F80F55D5AS"},
-                "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
-            }
-            config_path, _ = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            components = mock_flash.call_args[0][1]
-            assert "device" not in components
-            # 3 = atoc_erase + atoc + tfa (DEVICE key excluded)
-            assert len(components) == 3
+        config = {
+            "DEVICE": {"partNumber": "AE722F80F55D5AS"},
+            "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
+        }
+        config_path, _ = make_config_dir(config)
+        flash_from_config(config_path)
+        components = mock_flash.call_args[0][1]
+        assert "device" not in components
+        # 3 = atoc_erase + atoc + tfa (DEVICE key excluded)
+        assert len(components) == 3
 
-    def test_empty_config_returns_error(self):
+    def test_empty_config_returns_error(self, make_config_dir):
         """Config with no valid image entries returns error."""
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {"DEVICE": {"partNumber": "AE722F80F55D5AS"}}
-            config_path, _ = self._make_config_dir(tmp, config)
-            result = flash_from_config(config_path)
-            assert result["success"] is False
-            assert "No images" in result["message"]
+        config = {"DEVICE": {"partNumber": "AE722F80F55D5AS"}}
+        config_path, _ = make_config_dir(config)
+        result = flash_from_config(config_path)
+        assert result["success"] is False
+        assert "No images" in result["message"]
 
     @patch("alif_flash.jlink.flash_images")
-    def test_entry_without_mram_address_skipped(self, mock_flash):
+    def test_entry_without_mram_address_skipped(self, mock_flash, make_config_dir):
         """Entries missing mramAddress are skipped."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
-                "METADATA": {"binary": "meta.bin"},  # no mramAddress
-            }
-            config_path, _ = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            components = mock_flash.call_args[0][1]
-            assert "tfa" in components
-            assert "metadata" not in components
+        config = {
+            "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
+            "METADATA": {"binary": "meta.bin"},  # no mramAddress
+        }
+        config_path, _ = make_config_dir(config)
+        flash_from_config(config_path)
+        components = mock_flash.call_args[0][1]
+        assert "tfa" in components
+        assert "metadata" not in components
 
     @patch("alif_flash.jlink.flash_images")
-    def test_address_field_preferred(self, mock_flash):
+    def test_address_field_preferred(self, mock_flash, make_config_dir):
         """Generic 'address' field is supported and preferred over mramAddress."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "KERNEL": {"binary": "xipImage", "address": "0xC0100000"},
-            }
-            config_path, _ = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            components = mock_flash.call_args[0][1]
-            assert "kernel" in components
-            # Check the injected address is the OSPI address
-            assert MRAM_LAYOUT.get("kernel", {}).get("addr") != 0xC0100000  # cleaned up
+        config = {
+            "KERNEL": {"binary": "xipImage", "address": "0xC0100000"},
+        }
+        config_path, _ = make_config_dir(config)
+        flash_from_config(config_path)
+        components = mock_flash.call_args[0][1]
+        assert "kernel" in components
+        # Check the injected address is the OSPI address
+        assert MRAM_LAYOUT.get("kernel", {}).get("addr") != 0xC0100000  # cleaned up
         # Verify cleanup happened
         assert MRAM_LAYOUT["kernel"]["addr"] == 0x80020000
 
     @patch("alif_flash.jlink.flash_images")
-    def test_ospi_address_field(self, mock_flash):
+    def test_ospi_address_field(self, mock_flash, make_config_dir):
         """'ospiAddress' field is supported for OSPI entries."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "ROOTFS": {"binary": "rootfs.cramfs", "ospiAddress": "0xC0300000"},
-            }
-            config_path, _ = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            components = mock_flash.call_args[0][1]
-            assert "rootfs" in components
+        config = {
+            "ROOTFS": {"binary": "rootfs.cramfs", "ospiAddress": "0xC0300000"},
+        }
+        config_path, _ = make_config_dir(config)
+        flash_from_config(config_path)
+        components = mock_flash.call_args[0][1]
+        assert "rootfs" in components
         # Verify original layout restored
         assert MRAM_LAYOUT["rootfs"]["addr"] == 0x80300000
 
     @patch("alif_flash.jlink.flash_images")
-    def test_address_takes_priority_over_mram(self, mock_flash):
+    def test_address_takes_priority_over_mram(self, mock_flash, make_config_dir):
         """When both 'address' and 'mramAddress' present, 'address' wins."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "KERNEL": {
-                    "binary": "xipImage",
-                    "address": "0xC0100000",
-                    "mramAddress": "0x80020000",
-                },
-            }
-            config_path, _ = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
+        config = {
+            "KERNEL": {
+                "binary": "xipImage",
+                "address": "0xC0100000",
+                "mramAddress": "0x80020000",
+            },
+        }
+        config_path, _ = make_config_dir(config)
+        flash_from_config(config_path)
 
-            # flash_from_config passes custom layout via keyword arg
-            layout = mock_flash.call_args.kwargs.get("layout", {})
-            assert layout["kernel"]["addr"] == 0xC0100000
+        # flash_from_config passes custom layout via keyword arg
+        layout = mock_flash.call_args.kwargs.get("layout", {})
+        assert layout["kernel"]["addr"] == 0xC0100000
 
     @patch("alif_flash.jlink.flash_images")
-    def test_mixed_mram_ospi_config(self, mock_flash):
+    def test_mixed_mram_ospi_config(self, mock_flash, make_config_dir):
         """Config with both MRAM and OSPI entries is processed correctly."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
-                "DTB": {"binary": "appkit-e7.dtb", "mramAddress": "0x80010000"},
-                "KERNEL": {"binary": "xipImage", "address": "0xC0100000"},
-                "ROOTFS": {"binary": "rootfs.cramfs", "address": "0xC0300000"},
-            }
-            config_path, _ = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            components = mock_flash.call_args[0][1]
-            # 6 = atoc_erase + atoc + tfa + dtb + kernel + rootfs
-            assert len(components) == 6
-            assert "tfa" in components
-            assert "dtb" in components
-            assert "kernel" in components
-            assert "rootfs" in components
+        config = {
+            "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
+            "DTB": {"binary": "appkit-e7.dtb", "mramAddress": "0x80010000"},
+            "KERNEL": {"binary": "xipImage", "address": "0xC0100000"},
+            "ROOTFS": {"binary": "rootfs.cramfs", "address": "0xC0300000"},
+        }
+        config_path, _ = make_config_dir(config)
+        flash_from_config(config_path)
+        components = mock_flash.call_args[0][1]
+        # 6 = atoc_erase + atoc + tfa + dtb + kernel + rootfs
+        assert len(components) == 6
+        assert "tfa" in components
+        assert "dtb" in components
+        assert "kernel" in components
+        assert "rootfs" in components
 
     @patch("alif_flash.jlink.flash_images")
-    def test_mram_address_still_works(self, mock_flash):
+    def test_mram_address_still_works(self, mock_flash, make_config_dir):
         """Backward compat: mramAddress alone still works."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
-            }
-            config_path, _ = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            components = mock_flash.call_args[0][1]
-            assert "tfa" in components
+        config = {
+            "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
+        }
+        config_path, _ = make_config_dir(config)
+        flash_from_config(config_path)
+        components = mock_flash.call_args[0][1]
+        assert "tfa" in components
 
     @patch("alif_flash.jlink.flash_images")
-    def test_entry_without_any_address_skipped(self, mock_flash):
+    def test_entry_without_any_address_skipped(self, mock_flash, make_config_dir):
         """Entries missing all address fields are skipped."""
         mock_flash.return_value = {"success": True}
-        with tempfile.TemporaryDirectory() as tmp:
-            config = {
-                "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
-                "METADATA": {"binary": "meta.bin"},  # no address at all
-            }
-            config_path, _ = self._make_config_dir(tmp, config)
-            flash_from_config(config_path)
-            components = mock_flash.call_args[0][1]
-            assert "metadata" not in components
+        config = {
+            "TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"},
+            "METADATA": {"binary": "meta.bin"},  # no address at all
+        }
+        config_path, _ = make_config_dir(config)
+        flash_from_config(config_path)
+        components = mock_flash.call_args[0][1]
+        assert "metadata" not in components
+
+
+class TestInstallDeviceDef:
+    def test_second_install_skips_unchanged(self, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        for name in ("Devices.xml", "AlifE7.JLinkScript"):
+            (src / name).write_text(name)
+        dest = tmp_path / "dest"
+        with patch("alif_flash.jlink._JLINK_DATA_DIR", str(src)), \
+             patch("alif_flash.jlink.JLINK_DEVICES_DIR", str(dest)), \
+             patch("alif_flash.jlink.shutil.copy2", wraps=shutil.copy2) as cp:
+            r = install_device_def()
+            assert r["installed"] == ["Devices.xml", "AlifE7.JLinkScript"]
+            assert "skipped" not in r
+            assert cp.call_count == 2
+
+            (src / "Devices.xml").write_text("Devices.xml v2")
+            r = install_device_def()
+            assert r["skipped"] == ["AlifE7.JLinkScript"]
+            assert cp.call_count == 3
+        assert (dest / "Devices.xml").read_text() == "Devices.xml v2"
+
+    def test_missing_source(self, tmp_path):
+        with patch("alif_flash.jlink._JLINK_DATA_DIR", str(tmp_path)), \
+             patch("alif_flash.jlink.JLINK_DEVICES_DIR", str(tmp_path / "dest")):
+            r = install_device_def()
+        assert r["success"] is False
+        assert "Source file not found" in r["message"]
 
 
 class TestCheckSetupFLM:
     """Tests for OSPI flash loader detection in check_setup()."""
 
-    @patch("alif_flash.jlink.os.path.exists")
-    def test_flm_missing_adds_warning(self, mock_exists):
+    @patch("alif_flash.jlink.os.access", return_value=True)
+    @patch("alif_flash.jlink._device_dir_names",
+           return_value={"Devices.xml", "AlifE7.JLinkScript"})
+    def test_flm_missing_adds_warning(self, _names, _access):
         """Missing FLM file produces a warning, not an error."""
-        def exists_side_effect(path):
-            if OSPI_FLM_NAME in path:
-                return False
-            return True  # JLinkExe, Devices.xml, JLinkScript all present
-        mock_exists.side_effect = exists_side_effect
         result = check_setup()
         assert result["ready"] is True  # still ready — FLM is optional
         assert "warnings" in result
         assert any(OSPI_FLM_NAME in w for w in result["warnings"])
 
-    @patch("alif_flash.jlink.os.path.exists")
-    def test_flm_present_no_warning(self, mock_exists):
+    @patch("alif_flash.jlink.os.access", return_value=True)
+    @patch("alif_flash.jlink._device_dir_names",
+           return_value={"Devices.xml", "AlifE7.JLinkScript", OSPI_FLM_NAME})
+    def test_flm_present_no_warning(self, _names, _access):
         """When FLM is present, no warnings."""
-        mock_exists.return_value = True
         result = check_setup()
         assert result["ready"] is True
         assert "warnings" not in result
 
+    def test_scans_device_dir_once(self, tmp_path):
+        for name in ("Devices.xml", "AlifE7.JLinkScript"):
+            (tmp_path / name).touch()
+        with patch("alif_flash.jlink.JLINK_DEVICES_DIR", str(tmp_path)), \
+             patch("alif_flash.jlink.os.access", return_value=True), \
+             patch("alif_flash.jlink.os.scandir", wraps=os.scandir) as scan:
+            result = check_setup()
+        assert result["ready"] is True
+        assert any(OSPI_FLM_NAME in w for w in result["warnings"])
+        scan.assert_called_once_with(str(tmp_path))
+
 
 class TestOspiConstants:
     """Tests for OSPI-related constants."""
@@ -0,0 +1,21 @@
+"""Tests for the shared JSON helpers."""
+
+import json
+
+from alif_flash import jsonio
+
+
+class TestJsonio:
+    def test_round_trip_bytes(self):
+        data = {"TFA": {"binary": "bl32.bin", "mramAddress": "0x80002000"}}
+        out = jsonio.dumps(data)
+        assert isinstance(out, bytes)
+        assert jsonio.loads(out) == data
+
+    def test_indent(self):
+        out = jsonio.dumps({"a": [1, 2]}, indent=True).decode()
+        assert out == json.dumps({"a": [1, 2]}, indent=2)
+
+    def test_compact(self):
+        assert json.loads(jsonio.dumps({"a": 1})) == {"a": 1}
+        assert b"\n" not in jsonio.dumps({"a": [1, 2]})
@@ -22,6 +22,7 @@ from alif_flash.ospi_rtt import (
     DEVICE,
     MAX_WRITE_CHUNK,
     OSPI_XIP_BASE,
+    PIPELINE_DEPTH,
     RESP_FLAG,
     RESP_HEADER_FMT,
     RESP_HEADER_SIZE,
@@ -309,6 +310,70 @@ class TestOspiProgrammer:
             offset += CMD_HEADER_SIZE
         assert seqs == [0xFFFF, 0]
 
+    def test_program_pipelines_writes(self):
+        """Up to PIPELINE_DEPTH writes go out before the first response is read."""
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        n = PIPELINE_DEPTH + 2
+        data = b"\x11" * (MAX_WRITE_CHUNK * n)
+        for seq in range(1, n + 1):
+            jlink.queue_response(CMD_WRITE, STATUS_OK, seq)
+
+        events = []
+        real_write, real_read = jlink.rtt_write, jlink.rtt_read
+        jlink.rtt_write = lambda ch, d: events.append("w") or real_write(ch, d)
+        jlink.rtt_read = lambda ch, n: events.append("r") or real_read(ch, n)
+        prog.program(0x0, data)
+
+        assert events.index("r") == PIPELINE_DEPTH
+        assert events.count("w") == n
+        assert len(jlink._down_buffer) == n * CMD_HEADER_SIZE + len(data)
+
+    def test_program_returns_crc(self):
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        data = bytes(range(256)) * 20
+        jlink.queue_response(CMD_WRITE, STATUS_OK, 1)
+        jlink.queue_response(CMD_WRITE, STATUS_OK, 2)
+        assert prog.program(0x0, data, crc=0) == zlib.crc32(data)
+
+    def test_program_without_crc_returns_none(self):
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        jlink.queue_response(CMD_WRITE, STATUS_OK, 1)
+        assert prog.program(0x0, b"\x00" * 16) is None
+
+    def test_pipelined_seq_mismatch(self):
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        jlink.queue_response(CMD_WRITE, STATUS_OK, 2)
+        jlink.queue_response(CMD_WRITE, STATUS_OK, 1)
+        with pytest.raises(OspiProgrammerError, match="Sequence mismatch"):
+            prog.program(0x0, b"\x00" * (MAX_WRITE_CHUNK * 2))
+
+    def test_partial_writes_resume(self):
+        """Short RTT writes resend only the remaining bytes."""
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        real_write = jlink.rtt_write
+        calls = []
+
+        def short_write(channel, data):
+            calls.append(len(data))
+            if len(calls) == 2:
+                return 0  # down-buffer momentarily full
+            return real_write(channel, bytes(data)[:1000])
+
+        jlink.rtt_write = short_write
+        data = bytes(range(256)) * 10
+        jlink.queue_response(CMD_WRITE, STATUS_OK, 1)
+        prog.program(0x0, data)
+
+        assert bytes(jlink._down_buffer[CMD_HEADER_SIZE:]) == data
+        assert calls[:3] == [len(data) + CMD_HEADER_SIZE,
+                             len(data) + CMD_HEADER_SIZE - 1000,
+                             len(data) + CMD_HEADER_SIZE - 1000]
+
     def test_bad_param_error(self):
         jlink = MockJLink()
         prog = OspiProgrammer(jlink)
@@ -317,6 +382,36 @@ class TestOspiProgrammer:
             prog.program(0x0, b"\x00" * 256)
 
 
+class TestRttSession:
+    def _fake_pylink(self):
+        pylink = MagicMock()
+        jlink = pylink.JLink.return_value
+        jlink.connected_emulators.return_value = [MagicMock(SerialNumber=123)]
+        return pylink, jlink
+
+    def test_closes_on_error(self):
+        from alif_flash.ospi_rtt import rtt_session
+        pylink, jlink = self._fake_pylink()
+        with patch.dict("sys.modules", {"pylink": pylink}):
+            with pytest.raises(RuntimeError):
+                with rtt_session() as jl:
+                    assert jl is jlink
+                    raise RuntimeError("boom")
+        jlink.open.assert_called_once_with(serial_no=123)
+        jlink.rtt_stop.assert_called_once()
+        jlink.close.assert_called_once()
+
+    def test_no_emulators(self):
+        from alif_flash.ospi_rtt import rtt_session
+        pylink, jlink = self._fake_pylink()
+        jlink.connected_emulators.return_value = []
+        with patch.dict("sys.modules", {"pylink": pylink}):
+            with pytest.raises(OspiProgrammerError, match="No J-Link"):
+                with rtt_session():
+                    pass
+        jlink.open.assert_not_called()
+
+
 class TestAddressHandling:
     """Test address conversion (XIP to flash-relative)."""
 
@@ -365,6 +460,125 @@ class TestCRC32:
         assert crc == 0xFEA8A821
 
 
+class TestBackoff:
+    def test_first_retry_yields_then_doubles_to_cap(self):
+        from alif_flash.ospi_rtt import _POLL_MAX, _POLL_MIN, _backoff
+        slept = []
+        with patch("alif_flash.ospi_rtt.time.sleep", side_effect=slept.append):
+            delay = 0.0
+            for _ in range(10):
+                delay = _backoff(delay)
+        assert slept[:3] == [0.0, _POLL_MIN, _POLL_MIN * 2]
+        assert slept[-1] == delay == _POLL_MAX
+
+    def test_read_resets_after_data(self):
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        reads = iter([[], [], None, [], None])
+        real_read = jlink.rtt_read
+
+        def flaky_read(channel, n):
+            r = next(reads, None)
+            return real_read(channel, 1) if r is None else r
+
+        jlink.rtt_read = flaky_read
+        jlink.queue_response(CMD_PING, STATUS_OK, 1, b"v1")
+        slept = []
+        with patch("alif_flash.ospi_rtt.time.sleep", side_effect=slept.append):
+            assert prog.ping() == "v1"
+        assert slept == [0.0, 1e-5, 0.0]
+
+
+class TestFlashImage:
+    """Test sector-by-sector erase/program/verify."""
+
+    def _sent_cmds(self, jlink):
+        buf = bytes(jlink._down_buffer)
+        cmds, offset = [], 0
+        while offset < len(buf):
+            cmd_id, _, _, addr, length = struct.unpack(
+                CMD_HEADER_FMT, buf[offset:offset + CMD_HEADER_SIZE])
+            cmds.append((cmd_id, addr, length))
+            offset += CMD_HEADER_SIZE + (length if cmd_id == CMD_WRITE else 0)
+        return cmds
+
+    def test_splits_on_sector_boundaries(self):
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        addr = 0xC0000000 + SECTOR_SIZE - 0x100
+        data = bytes(range(256)) * 2
+        seq = 0
+        for chunk in (data[:0x100], data[0x100:]):
+            crc = zlib.crc32(chunk) & 0xFFFFFFFF
+            for cmd, payload in ((CMD_ERASE, b""), (CMD_WRITE, b""),
+                                 (CMD_VERIFY, struct.pack("<I", crc))):
+                seq += 1
+                jlink.queue_response(cmd, STATUS_OK, seq, payload)
+
+        progress = []
+        result = prog.flash_image(addr, data,
+                                  progress_cb=lambda w, t: progress.append((w, t)))
+
+        assert self._sent_cmds(jlink) == [
+            (CMD_ERASE, addr, 0x100),
+            (CMD_WRITE, addr, 0x100),
+            (CMD_VERIFY, addr, 0x100),
+            (CMD_ERASE, 0xC0000000 + SECTOR_SIZE, 0x100),
+            (CMD_WRITE, 0xC0000000 + SECTOR_SIZE, 0x100),
+            (CMD_VERIFY, 0xC0000000 + SECTOR_SIZE, 0x100),
+        ]
+        assert progress == [(0x100, 0x200), (0x200, 0x200)]
+        assert result["crc32"] == f"0x{zlib.crc32(data) & 0xFFFFFFFF:08x}"
+        assert result["verified"] is True
+
+    def test_verify_failure_stops_before_next_sector(self):
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        data = b"\x5A" * (SECTOR_SIZE + 16)
+        jlink.queue_response(CMD_ERASE, STATUS_OK, 1)
+        for seq in range(2, 2 + SECTOR_SIZE // MAX_WRITE_CHUNK):
+            jlink.queue_response(CMD_WRITE, STATUS_OK, seq)
+        jlink.queue_response(CMD_VERIFY, STATUS_OK, seq + 1, struct.pack("<I", 0))
+
+        with pytest.raises(OspiProgrammerError, match="Verify failed at 0xc0000000"):
+            prog.flash_image(0xC0000000, data, force=True)
+        assert self._sent_cmds(jlink)[-1] == (CMD_VERIFY, 0xC0000000, SECTOR_SIZE)
+
+    def test_unchanged_sector_skipped(self):
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        data = b"\x5A" * (SECTOR_SIZE + 16)
+        head_crc = zlib.crc32(data[:SECTOR_SIZE])
+        tail_crc = zlib.crc32(data[SECTOR_SIZE:])
+        jlink.queue_response(CMD_VERIFY, STATUS_OK, 1, struct.pack("<I", head_crc))
+        jlink.queue_response(CMD_ERASE, STATUS_OK, 2)
+        jlink.queue_response(CMD_WRITE, STATUS_OK, 3)
+        jlink.queue_response(CMD_VERIFY, STATUS_OK, 4, struct.pack("<I", tail_crc))
+
+        result = prog.flash_image(0xC0000000, data)
+
+        tail = 0xC0000000 + SECTOR_SIZE
+        assert self._sent_cmds(jlink) == [
+            (CMD_VERIFY, 0xC0000000, SECTOR_SIZE),
+            (CMD_ERASE, tail, 16), (CMD_WRITE, tail, 16), (CMD_VERIFY, tail, 16)]
+        assert result["sectors_skipped"] == 1
+        assert result["crc32"] == f"0x{zlib.crc32(data):08x}"
+
+    def test_changed_sector_rewritten(self):
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        data = b"\x5A" * SECTOR_SIZE
+        jlink.queue_response(CMD_VERIFY, STATUS_OK, 1, struct.pack("<I", 0))
+        jlink.queue_response(CMD_ERASE, STATUS_OK, 2)
+        for seq in range(3, 3 + SECTOR_SIZE // MAX_WRITE_CHUNK):
+            jlink.queue_response(CMD_WRITE, STATUS_OK, seq)
+
+        result = prog.flash_image(0xC0000000, data, verify=False)
+        assert self._sent_cmds(jlink)[:2] == [(CMD_VERIFY, 0xC0000000, SECTOR_SIZE),
+                                              (CMD_ERASE, 0xC0000000, SECTOR_SIZE)]
+        assert "sectors_skipped" not in result
+
+
 class TestFlashImages:
     """Test config-based multi-image programming."""
 
@@ -410,6 +624,61 @@ class TestFlashImages:
         assert results["images"]["ROOTFS"]["status"] == "ok"
         assert results["images"]["ROOTFS"]["verified"] is True
 
+    def test_flash_images_empty_binary(self):
+        """A zero-length binary is flashed as an empty image, not mmapped."""
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        config = {"ROOTFS": {"binary": "empty.bin", "address": "0xC0000000"}}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config_path = os.path.join(tmpdir, "config.json")
+            with open(config_path, "w") as f:
+                json.dump(config, f)
+            open(os.path.join(tmpdir, "empty.bin"), "wb").close()
+
+            results = prog.flash_images(config_path)
+
+        assert results["images"]["ROOTFS"]["size"] == 0
+        assert results["images"]["ROOTFS"]["status"] == "ok"
+        assert len(jlink._down_buffer) == 0
+
+    def test_flash_images_maps_next_image_ahead(self):
+        """The next image is mapped before the current one is flashed."""
+        jlink = MockJLink()
+        prog = OspiProgrammer(jlink)
+        config = {
+            "A": {"binary": "a.bin", "address": "0xC0000000"},
+            "MISSING": {"binary": "nope.bin", "address": "0xC0100000"},
+            "B": {"binary": "b.bin", "address": "0xC0200000"},
+        }
+        events = []
+
+        def fake_flash(addr, data, verify=True, progress_cb=None, force=False):
+            events.append(("flash", bytes(data)))
+            return {"status": "ok"}
+
+        def fake_map(path):
+            events.append(("map", os.path.basename(path)))
+            with open(path, "rb") as f:
+                return f.read()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config_path = os.path.join(tmpdir, "config.json")
+            with open(config_path, "w") as f:
+                json.dump(config, f)
+            for n in ("a", "b"):
+                with open(os.path.join(tmpdir, f"{n}.bin"), "wb") as f:
+                    f.write(n.encode())
+
+            prog.flash_image = fake_flash
+            with patch("alif_flash.ospi_rtt._map_image", side_effect=fake_map):
+                results = prog.flash_images(config_path)
+
+        assert events == [("map", "a.bin"), ("map", "b.bin"),
+                          ("flash", b"a"), ("flash", b"b")]
+        assert list(results["images"]) == ["A", "MISSING", "B"]
+        assert results["images"]["MISSING"]["status"] == "file_not_found"
+
     def test_flash_images_skips_disabled(self):
         """Disabled entries should be skipped."""
         config = {